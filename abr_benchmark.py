@@ -0,0 +1,206 @@
+# Startup delay and rebuffering of fixed vs adaptive quality over throttled links.
+# Segments are fetched over HTTP from a local video server whose bandwidth follows
+# a link profile; media time runs SPEEDUP times faster than the wall clock (and
+# every link is SPEEDUP times faster) so a minute of playback takes seconds.
+import os
+import posixpath
+import sys
+import tempfile
+import threading
+import time
+from urllib.request import urlopen
+
+from adaptive import RenditionSelector, allowed_qualities, eligible_variants, media_playlist, parse_master_playlist
+from catalog import QUALITIES
+from video_server import VideoRequestHandler, VideoServer
+
+SPEEDUP = 20
+SEND_SLICE = 16 * 1024
+# Buffered media needed before playback starts, and the most the player keeps ahead
+STARTUP_BUFFER = 4.0
+MAX_BUFFER = 30.0
+
+# (seconds, bits per second) steps, repeated for as long as playback runs
+LINK_PROFILES = {
+    'fiber': [(60, 100_000_000)],
+    'broadband': [(60, 15_000_000)],
+    'mobile': [(60, 4_000_000)],
+    'fluctuating': [(10, 30_000_000), (10, 3_000_000)],
+}
+LINK_LATENCY = 0.04
+
+# Synthetic ladder used when no segmented title is given
+LADDER = {'HD': 3_000_000, '4K': 12_000_000, '8K': 30_000_000}
+LADDER_SECONDS = 60
+LADDER_SEGMENT = 4
+
+
+class ThrottledLink:
+    def __init__(self, profile, latency=LINK_LATENCY, speedup=SPEEDUP):
+        self.profile = profile
+        self.latency = latency
+        self.speedup = speedup
+        self.started = time.perf_counter()
+
+    def media_time(self):
+        return (time.perf_counter() - self.started) * self.speedup
+
+    def rate(self):
+        position = self.media_time() % sum(seconds for seconds, _ in self.profile)
+        for seconds, bits_per_second in self.profile:
+            if position < seconds:
+                return bits_per_second
+            position -= seconds
+        return self.profile[-1][1]
+
+    def pace(self, size):
+        time.sleep(size * 8 / (self.rate() * self.speedup))
+
+
+class ThrottledRequestHandler(VideoRequestHandler):
+    def send_body(self, f, path, stat, start, end):
+        link = self.server.link
+        time.sleep(link.latency / link.speedup)
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining:
+            data = f.read(min(SEND_SLICE, remaining))
+            if not data:
+                return
+            link.pace(len(data))
+            self.wfile.write(data)
+            remaining -= len(data)
+
+
+class ThrottledVideoServer(VideoServer):
+    handler = ThrottledRequestHandler
+
+    def __init__(self, root, address, link):
+        self.link = link
+        super().__init__(root, address)
+
+
+def stream(base_url, manifest, choose, record, speedup=SPEEDUP):
+    # Play a title from start to end; returns startup delay, rebuffering and bitrate stats
+    def fetch(uri):
+        start = time.perf_counter()
+        with urlopen(f'{base_url}/{uri}') as response:
+            data = response.read()
+        elapsed = (time.perf_counter() - start) * speedup
+        record(elapsed, len(data))
+        return data, elapsed
+
+    folder = os.path.dirname(manifest)
+    variants = parse_master_playlist(fetch(manifest)[0].decode('utf-8'))
+    playlists, initialised = {}, set()
+    for variant in variants:
+        with urlopen(f'{base_url}/{posixpath.join(folder, variant["uri"])}') as response:
+            playlists[variant['uri']] = media_playlist(response.read().decode('utf-8'))
+
+    buffer = clock = stall = played = bits = 0.0
+    startup = None
+    switches, previous = 0, None
+    counts = {}
+    for index in range(len(playlists[variants[0]['uri']][1])):
+        if buffer > MAX_BUFFER:
+            # Buffer full: let playback drain it before fetching more
+            time.sleep((buffer - MAX_BUFFER) / speedup)
+            clock += buffer - MAX_BUFFER
+            played += buffer - MAX_BUFFER
+            buffer = MAX_BUFFER
+
+        variant = choose()
+        init, segments = playlists[variant['uri']]
+        variant_folder = posixpath.join(folder, posixpath.dirname(variant['uri']))
+        elapsed = 0.0
+        if variant['uri'] not in initialised:
+            elapsed += fetch(posixpath.join(variant_folder, init))[1]
+            initialised.add(variant['uri'])
+        uri, seconds = segments[index]
+        data, download = fetch(posixpath.join(variant_folder, uri))
+        elapsed += download
+
+        clock += elapsed
+        if startup is not None:
+            played += min(buffer, elapsed)
+            stall += max(0.0, elapsed - buffer)
+            buffer = max(0.0, buffer - elapsed)
+        buffer += seconds
+        if startup is None and buffer >= STARTUP_BUFFER:
+            startup = clock
+        bits += len(data) * 8
+        counts[variant['quality']] = counts.get(variant['quality'], 0) + 1
+        switches += previous is not None and variant is not previous
+        previous = variant
+
+    played += buffer
+    return {
+        'startup': startup or clock,
+        'rebuffer_ratio': stall / (played + stall) if played + stall else 0.0,
+        'bitrate': bits / played if played else 0.0,
+        'switches': switches,
+        'segments': counts,
+    }
+
+
+def write_ladder(root):
+    # Segmented-looking title whose segments are filler bytes at each ladder bitrate
+    lines = ['#EXTM3U', '#EXT-X-VERSION:7']
+    for quality, bits_per_second in LADDER.items():
+        os.makedirs(os.path.join(root, 'ladder', quality))
+        playlist = ['#EXTM3U', '#EXT-X-VERSION:7', f'#EXT-X-TARGETDURATION:{LADDER_SEGMENT}',
+                    '#EXT-X-MAP:URI="init.mp4"']
+        with open(os.path.join(root, 'ladder', quality, 'init.mp4'), 'wb') as f:
+            f.write(bytes(1024))
+        for n in range(LADDER_SECONDS // LADDER_SEGMENT):
+            with open(os.path.join(root, 'ladder', quality, f'seg_{n:05d}.m4s'), 'wb') as f:
+                f.write(bytes(bits_per_second * LADDER_SEGMENT // 8))
+            playlist += [f'#EXTINF:{LADDER_SEGMENT:.3f},', f'seg_{n:05d}.m4s']
+        with open(os.path.join(root, 'ladder', quality, 'index.m3u8'), 'w') as f:
+            f.write('\n'.join(playlist + ['#EXT-X-ENDLIST']) + '\n')
+        lines += [f'#EXT-X-STREAM-INF:BANDWIDTH={bits_per_second}', f'{quality}/index.m3u8']
+    with open(os.path.join(root, 'ladder', 'master.m3u8'), 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    return os.path.join('ladder', 'master.m3u8')
+
+
+def run(root, manifest, quality_pref):
+    with open(os.path.join(root, manifest), 'r') as f:
+        variants = parse_master_playlist(f.read())
+    allowed = allowed_qualities(None, quality_pref)
+
+    print(f"{'link':<12} {'strategy':<9} {'startup':>8} {'rebuffer':>9} {'bitrate':>10} {'switches':>8}  segments")
+    for name, profile in LINK_PROFILES.items():
+        for strategy in ('fixed', 'adaptive'):
+            link = ThrottledLink(profile)
+            server = ThrottledVideoServer(root, ('localhost', 0), link)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            try:
+                if strategy == 'fixed':
+                    # What a single progressive file gives: the preferred quality regardless of the link
+                    top = eligible_variants(variants, allowed)[-1]
+                    result = stream(f'http://localhost:{server.server_address[1]}', manifest,
+                                    lambda: top, lambda seconds, size: None)
+                else:
+                    selector = RenditionSelector(variants, allowed)
+                    result = stream(f'http://localhost:{server.server_address[1]}', manifest,
+                                    selector.choose, selector.record)
+            finally:
+                server.shutdown()
+                server.server_close()
+            mix = ', '.join(f'{quality} x{count}' for quality, count in result['segments'].items())
+            print(f"{name:<12} {strategy:<9} {result['startup']:7.2f}s {result['rebuffer_ratio']:8.1%} "
+                  f"{result['bitrate'] / 1e6:7.2f} Mb/s {result['switches']:8d}  {mix}")
+
+
+def main():
+    quality_pref = sys.argv[1] if len(sys.argv) > 1 else QUALITIES[-1]
+    if len(sys.argv) > 2:
+        run(os.path.dirname(os.path.abspath(sys.argv[2])) or '.', os.path.basename(sys.argv[2]), quality_pref)
+        return
+    with tempfile.TemporaryDirectory() as root:
+        run(root, write_ladder(root), quality_pref)
+
+
+if __name__ == "__main__":
+    main()
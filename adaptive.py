@@ -0,0 +1,146 @@
+# Adaptive rendition selection: pick the best HLS variant a connection can sustain,
+# from throughput measured on the segments already downloaded
+import os
+
+from catalog import QUALITIES
+
+# Exponentially weighted throughput averages, with half-lives in seconds of download
+# time. The slow one resists short bursts, the fast one reacts to sudden drops;
+# the estimate is the lower of the two (the same scheme hls.js and Shaka use).
+FAST_HALF_LIFE = 3.0
+SLOW_HALF_LIFE = 9.0
+# Share of the estimate a variant's bandwidth may use, leaving headroom for jitter
+SAFETY_FACTOR = 0.8
+# Assumed before the first segment has been measured
+DEFAULT_ESTIMATE = 1_000_000
+
+
+class Ewma:
+    def __init__(self, half_life):
+        self.half_life = half_life
+        self.value = 0.0
+        self.total_weight = 0.0
+
+    def sample(self, weight, value):
+        alpha = 0.5 ** (weight / self.half_life)
+        self.value = value * (1 - alpha) + self.value * alpha
+        self.total_weight += weight
+
+    def estimate(self):
+        # Undo the bias towards the zero starting value
+        return self.value / (1 - 0.5 ** (self.total_weight / self.half_life))
+
+
+class ThroughputEstimator:
+    def __init__(self, default=DEFAULT_ESTIMATE):
+        self.default = default
+        self.fast = Ewma(FAST_HALF_LIFE)
+        self.slow = Ewma(SLOW_HALF_LIFE)
+
+    def record(self, seconds, size):
+        # One finished download of size bytes that took seconds
+        seconds = max(seconds, 1e-3)
+        bits_per_second = size * 8 / seconds
+        self.fast.sample(seconds, bits_per_second)
+        self.slow.sample(seconds, bits_per_second)
+
+    def estimate(self):
+        if not self.slow.total_weight:
+            return self.default
+        return min(self.fast.estimate(), self.slow.estimate())
+
+
+def parse_master_playlist(text):
+    # Variants of an HLS master playlist, lowest bandwidth first. The quality label
+    # is the directory hls_segmenter.py wrote the rendition to ("HD", "4K", ...).
+    variants = []
+    attributes = None
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith('#EXT-X-STREAM-INF:'):
+            attributes = parse_attributes(line[len('#EXT-X-STREAM-INF:'):])
+        elif line and not line.startswith('#') and attributes is not None:
+            variants.append({
+                'uri': line,
+                'quality': line.split('/')[0],
+                'bandwidth': int(attributes.get('BANDWIDTH', 0)),
+                'resolution': attributes.get('RESOLUTION'),
+            })
+            attributes = None
+    return sorted(variants, key=lambda variant: variant['bandwidth'])
+
+
+def media_playlist(text):
+    # Init segment uri and (uri, seconds) per segment of an HLS media playlist
+    segments, init, duration = [], None, None
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith('#EXT-X-MAP:URI='):
+            init = line.split('=', 1)[1].strip('"')
+        elif line.startswith('#EXTINF:'):
+            duration = float(line[len('#EXTINF:'):].split(',')[0])
+        elif line and not line.startswith('#') and duration is not None:
+            segments.append((line, duration))
+            duration = None
+    return init, segments
+
+
+def parse_attributes(text):
+    attributes = {}
+    key, value, quoted = '', '', False
+    reading_key = True
+    for char in text + ',':
+        if reading_key:
+            if char == '=':
+                reading_key = False
+            else:
+                key += char
+        elif char == '"':
+            quoted = not quoted
+        elif char == ',' and not quoted:
+            attributes[key.strip()] = value
+            key, value, reading_key = '', '', True
+        else:
+            value += char
+    return attributes
+
+
+def allowed_qualities(title_qualities, quality_pref):
+    # Qualities a title lists, up to and including the preferred one
+    cap = QUALITIES.index(quality_pref) if quality_pref in QUALITIES else len(QUALITIES) - 1
+    listed = QUALITIES if title_qualities is None else title_qualities
+    return [quality for quality in QUALITIES[:cap + 1] if quality in listed]
+
+
+def eligible_variants(variants, allowed):
+    # Variants below every catalog quality (e.g. "SD") are always a valid fallback
+    eligible = [variant for variant in variants if variant['quality'] in allowed or variant['quality'] not in QUALITIES]
+    return eligible or variants[:1]
+
+
+class RenditionSelector:
+    def __init__(self, variants, allowed, estimator=None):
+        self.variants = eligible_variants(variants, allowed)
+        self.estimator = estimator or ThroughputEstimator()
+
+    def record(self, seconds, size):
+        self.estimator.record(seconds, size)
+
+    def choose(self):
+        # Highest-bandwidth variant within the safe share of the estimate, else the lowest
+        budget = self.estimator.estimate() * SAFETY_FACTOR
+        chosen = self.variants[0]
+        for variant in self.variants:
+            if variant['bandwidth'] <= budget:
+                chosen = variant
+        return chosen
+
+
+def bandwidth_cap(manifest_path, allowed, root='.'):
+    # Highest variant bandwidth a player may switch up to, or None if unrestricted
+    with open(os.path.join(root, manifest_path), 'r') as f:
+        variants = parse_master_playlist(f.read())
+    eligible = eligible_variants(variants, allowed)
+    if len(eligible) == len(variants):
+        return None
+    return eligible[-1]['bandwidth']
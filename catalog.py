@@ -0,0 +1,628 @@
+# Columnar in-memory catalog engine for StreamFlix Pro
+from bisect import bisect_left, bisect_right
+from collections import Counter
+
+import numpy as np
+
+# Content type codes stored in the `types` column
+CONTENT_TYPES = ['movie', 'tv_show']
+SECTIONS = {'movie': 'movies', 'tv_show': 'tv_shows'}
+
+# Numeric columns and their dtypes, in the order produced by _row_values()
+COLUMNS = [
+    ('types', np.int8),
+    ('ids', np.int64),
+    ('years', np.int32),
+    ('ratings', np.float64),
+    ('views', np.int64),
+    ('likes', np.int64),
+    ('genre_codes', np.int32),
+    ('total_episodes', np.int32),
+    ('language_masks', np.int32),
+    ('quality_masks', np.int32),
+]
+
+# Languages and qualities offered in the player preferences, one mask bit each
+LANGUAGES = ['English', 'Spanish', 'French', 'Mandarin']
+QUALITIES = ['HD', '4K', '8K']
+
+SORT_COLUMNS = {
+    'Rating': 'ratings',
+    'Year': 'years',
+    'Views': 'views',
+    'Title': 'title_ranks',
+}
+
+# Rows scanned per step when only the head of a sorted listing is needed
+SORT_CHUNK = 4096
+
+# Minimum-rating bitsets are kept at every tenth of a star (the sidebar slider's step)
+RATING_SCALE = 10
+RATING_BUCKETS = 10 * RATING_SCALE + 1
+
+
+def bitsets(row_groups, size):
+    # One packed bitset (bit i = row i) per group of rows, padded to whole 64-bit words
+    bits = np.zeros((len(row_groups), (size + 63) // 64 * 8), dtype=np.uint8)
+    mask = np.zeros(bits.shape[1] * 8, dtype=bool)
+    for i, rows in enumerate(row_groups):
+        mask[rows] = True
+        bits[i] = np.packbits(mask)
+        mask[rows] = False
+    return bits
+
+
+def threshold_bitsets(rows, values, thresholds, size):
+    # Packed bitsets of the rows whose value is at least each (ascending) threshold,
+    # filled in one sweep from the highest threshold down
+    order = np.argsort(-values, kind='stable')
+    negated = -values[order]
+    bits = np.zeros((len(thresholds), (size + 63) // 64 * 8), dtype=np.uint8)
+    mask = np.zeros(bits.shape[1] * 8, dtype=bool)
+    filled = 0
+    for i in reversed(range(len(thresholds))):
+        end = np.searchsorted(negated, -thresholds[i], side='right')
+        mask[rows[order[filled:end]]] = True
+        filled = end
+        bits[i] = np.packbits(mask)
+    return bits
+
+
+def bitset_rows(bits):
+    # Rows set in a packed bitset, ascending
+    return np.flatnonzero(np.unpackbits(bits).view(bool))
+
+
+def popcount(bits):
+    # Set bits in each row of a 2-D array of packed bitsets
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(bits.view(np.uint64)).sum(axis=1, dtype=np.int64)
+    # numpy < 2.0
+    return np.array([np.count_nonzero(np.unpackbits(row).view(bool)) for row in bits], dtype=np.int64)
+
+
+def bitmask(values, vocabulary):
+    # Titles that do not list any values are treated as available in all of them
+    if values is None:
+        return (1 << len(vocabulary)) - 1
+    mask = 0
+    for value in values:
+        if value in vocabulary:
+            mask |= 1 << vocabulary.index(value)
+    return mask
+
+
+def dense_ranks(values):
+    # Rank of each value among the distinct values, so equal values share a rank
+    ranks = np.empty(len(values), dtype=np.int64)
+    rank, previous = -1, None
+    for row in sorted(range(len(values)), key=values.__getitem__):
+        if rank < 0 or values[row] != previous:
+            rank, previous = rank + 1, values[row]
+        ranks[row] = rank
+    return ranks
+
+
+def preference_bit(value, vocabulary):
+    return 1 << vocabulary.index(value) if value in vocabulary else 0
+
+
+def group_rows(rows, keys):
+    # {key: rows with that key}, keys in order of first appearance, rows in row order
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    starts = np.flatnonzero(sorted_keys[1:] != sorted_keys[:-1]) + 1
+    groups = np.split(rows[order], starts) if len(rows) else []
+    groups.sort(key=lambda group: group[0])
+    return {keys[np.searchsorted(rows, group[0])].item(): group for group in groups}
+
+
+class FacetIndex:
+    # Genre and year buckets for one content type (or all of them)
+    def __init__(self, catalog, content_type=None):
+        rows = catalog.rows(content_type)
+        by_code = group_rows(rows, catalog.genre_codes[rows])
+        self.genre_rows = {catalog.genres[code]: group for code, group in by_code.items()}
+        self.year_rows = group_rows(rows, catalog.years[rows])
+        self.genres = sorted(self.genre_rows)
+        self.years = sorted(self.year_rows)
+
+
+class BitsetIndex:
+    # Bitset posting lists over the live rows: a filter is an OR over the year
+    # range ANDed with the content type, rating and genre bitsets
+    def __init__(self, catalog):
+        rows = catalog.rows()
+        size = len(catalog.records)
+        self.ratings = catalog.ratings
+        self.genre_names = list(catalog.genres)
+        self.genre_index = {genre: code for code, genre in enumerate(self.genre_names)}
+
+        types = catalog.types[rows]
+        self.type_bits = bitsets([rows[types == code] for code in range(len(CONTENT_TYPES))], size)
+        by_code = group_rows(rows, catalog.genre_codes[rows])
+        self.genre_bits = bitsets([by_code.get(code, []) for code in range(len(self.genre_names))], size)
+        by_year = group_rows(rows, catalog.years[rows])
+        self.years = sorted(by_year)
+        self.year_bits = bitsets([by_year[year] for year in self.years], size)
+        # rating_bits[i] holds the rows rated at least i / RATING_SCALE
+        thresholds = [i / RATING_SCALE for i in range(RATING_BUCKETS)]
+        self.rating_bits = threshold_bitsets(rows, catalog.ratings[rows], thresholds, size)
+        language_masks = catalog.language_masks[rows]
+        self.language_bits = bitsets([rows[language_masks & (1 << i) != 0] for i in range(len(LANGUAGES))], size)
+        quality_masks = catalog.quality_masks[rows]
+        self.quality_bits = bitsets([rows[quality_masks & (1 << i) != 0] for i in range(len(QUALITIES))], size)
+        self._last_selection = None
+
+    def selection(self, content_type, year_range, rating_filter, language=None, quality=None):
+        # Bitset of rows of the type within the year range, at or above the rating and
+        # available in the language and quality. The last one is kept, so the listing
+        # reuses the pass behind the sidebar counts.
+        key = (content_type, tuple(year_range), rating_filter, language, quality)
+        last = self._last_selection
+        if last is not None and last[0] == key:
+            return last[1]
+
+        low = bisect_left(self.years, year_range[0])
+        high = bisect_right(self.years, year_range[1])
+        bits = np.bitwise_or.reduce(self.year_bits[low:high], axis=0)
+        if content_type is not None:
+            bits &= self.type_bits[CONTENT_TYPES.index(content_type)]
+        for value, vocabulary, value_bits in ((language, LANGUAGES, self.language_bits),
+                                              (quality, QUALITIES, self.quality_bits)):
+            if value is not None:
+                bits &= value_bits[vocabulary.index(value)] if value in vocabulary else 0
+
+        # Highest bucket at or below the threshold
+        bucket = min(max(round(rating_filter * RATING_SCALE), 0), RATING_BUCKETS - 1)
+        if bucket / RATING_SCALE > rating_filter:
+            bucket -= 1
+        if bucket >= 0:
+            bits &= self.rating_bits[bucket]
+        if bucket < 0 or bucket / RATING_SCALE < rating_filter:
+            # Threshold between buckets: check the ratings of the remaining rows
+            rows = bitset_rows(bits)
+            failing = np.zeros(len(bits) * 8, dtype=bool)
+            failing[rows[self.ratings[rows] < rating_filter]] = True
+            bits &= ~np.packbits(failing)
+
+        self._last_selection = (key, bits)
+        return bits
+
+    def genre_counts(self, content_type, year_range, rating_filter, language=None, quality=None):
+        # Matching rows per genre for the current type, year, rating and preference choices
+        bits = self.selection(content_type, year_range, rating_filter, language, quality)
+        counts = popcount(self.genre_bits & bits)
+        return {genre: count for genre, count in zip(self.genre_names, counts.tolist()) if count}
+
+    def filter(self, content_type, genre_filter, year_range, rating_filter, language=None, quality=None):
+        bits = self.selection(content_type, year_range, rating_filter, language, quality)
+        if genre_filter != "All":
+            if genre_filter not in self.genre_index:
+                return np.empty(0, dtype=np.int64)
+            bits = bits & self.genre_bits[self.genre_index[genre_filter]]
+        return bitset_rows(bits)
+
+
+class CatalogAggregates:
+    # Totals over the live rows, patched row by row as the catalog is edited
+    def __init__(self, catalog):
+        rows = catalog.rows()
+        types = catalog.types[rows]
+        self.counts = [int(np.count_nonzero(types == code)) for code in range(len(CONTENT_TYPES))]
+        self.episodes = [int(catalog.total_episodes[rows[types == code]].sum()) for code in range(len(CONTENT_TYPES))]
+        self.rating_sum = float(catalog.ratings[rows].sum())
+        self.genre_counts = np.bincount(catalog.genre_codes[rows], minlength=len(catalog.genres))
+        values, counts = np.unique(catalog.ratings[rows], return_counts=True)
+        self.rating_counts = Counter(dict(zip(values.tolist(), counts.tolist())))
+
+    def add_row(self, catalog, row, sign=1):
+        code = catalog.types[row]
+        self.counts[code] += sign
+        self.episodes[code] += sign * int(catalog.total_episodes[row])
+        self.rating_sum += sign * float(catalog.ratings[row])
+        genre_code = catalog.genre_codes[row]
+        if genre_code >= len(self.genre_counts):
+            self.genre_counts = np.append(self.genre_counts, np.zeros(genre_code + 1 - len(self.genre_counts), dtype=np.int64))
+        self.genre_counts[genre_code] += sign
+        rating = float(catalog.ratings[row])
+        self.rating_counts[rating] += sign
+        if not self.rating_counts[rating]:
+            del self.rating_counts[rating]
+
+    def remove_row(self, catalog, row):
+        self.add_row(catalog, row, -1)
+
+    def copy(self):
+        aggregates = CatalogAggregates.__new__(CatalogAggregates)
+        aggregates.counts = list(self.counts)
+        aggregates.episodes = list(self.episodes)
+        aggregates.rating_sum = self.rating_sum
+        aggregates.genre_counts = self.genre_counts.copy()
+        aggregates.rating_counts = Counter(self.rating_counts)
+        return aggregates
+
+
+class Catalog:
+    def __init__(self, content_data):
+        self.records = []
+        # Genres are stored as categorical codes into this list
+        self.genres = []
+        self.genre_lookup = {}
+        self._title_ranks = None
+        self._row_by_id = None
+        # File position per row once a hot reload has added or moved titles;
+        # until then rows are in file order
+        self._positions = None
+        # Bumped on every edit; derived structures are cached per version
+        self.version = 0
+        self._permutations = {}
+        self._facets = {}
+        self._bitsets = None
+        self._playable = {}
+        self._aggregates = None
+
+        values = []
+        for content_type in CONTENT_TYPES:
+            for content in content_data.get(SECTIONS[content_type], []):
+                self.records.append(content)
+                values.append(self._row_values(content_type, content))
+
+        for idx, (name, dtype) in enumerate(COLUMNS):
+            setattr(self, name, np.array([row[idx] for row in values], dtype=dtype))
+        # Removed rows stay in place so row numbers held by indexes remain valid
+        self.live = np.ones(len(self.records), dtype=bool)
+
+    @classmethod
+    def from_columns(cls, records, columns, genres, title_ranks=None):
+        # Wrap prebuilt columns (e.g. memory-mapped from a snapshot) without copying
+        catalog = cls.__new__(cls)
+        catalog.records = records
+        catalog.genres = list(genres)
+        catalog.genre_lookup = {genre: code for code, genre in enumerate(catalog.genres)}
+        catalog._title_ranks = title_ranks
+        catalog._row_by_id = None
+        catalog._positions = None
+        catalog.version = 0
+        catalog._permutations = {}
+        catalog._facets = {}
+        catalog._bitsets = None
+        catalog._playable = {}
+        catalog._aggregates = None
+        for name, _ in COLUMNS:
+            setattr(catalog, name, columns[name])
+        catalog.live = np.ones(len(records), dtype=bool)
+        return catalog
+
+    def _genre_code(self, genre):
+        if genre not in self.genre_lookup:
+            self.genre_lookup[genre] = len(self.genres)
+            self.genres.append(genre)
+        return self.genre_lookup[genre]
+
+    def _row_values(self, content_type, content):
+        return (
+            CONTENT_TYPES.index(content_type),
+            content['id'],
+            content['year'],
+            content['rating'],
+            content.get('views', 0),
+            content.get('likes', 0),
+            self._genre_code(content['genre']),
+            content.get('total_episodes', 0),
+            bitmask(content.get('languages'), LANGUAGES),
+            bitmask(content.get('quality'), QUALITIES),
+        )
+
+    def __len__(self):
+        return int(np.count_nonzero(self.live))
+
+    @property
+    def row_by_id(self):
+        if self._row_by_id is None:
+            live_rows = self.rows()
+            self._row_by_id = dict(zip(self.ids[live_rows].tolist(), live_rows.tolist()))
+        return self._row_by_id
+
+    @property
+    def title_ranks(self):
+        # Titles are only ever compared, so keep their dense rank instead of the
+        # strings; equal titles share a rank and keep row order in either direction
+        if self._title_ranks is None:
+            self._title_ranks = dense_ranks([record['title'] for record in self.records])
+        return self._title_ranks
+
+    def _rank_title(self, row, title):
+        # Give row the rank of title, shifting later ranks if the title is new.
+        # Binary search over one row per rank decodes only O(log n) records.
+        ranks = self._title_ranks
+        ranks[row] = -1
+        ranked = np.flatnonzero(ranks >= 0)
+        holders = np.empty(int(ranks.max()) + 1, dtype=np.int64)
+        holders[ranks[ranked]] = ranked
+        low, high = 0, len(holders)
+        while low < high:
+            middle = (low + high) // 2
+            if self.records[holders[middle]]['title'] < title:
+                low = middle + 1
+            else:
+                high = middle
+        if low == len(holders) or self.records[holders[low]]['title'] != title:
+            ranks[ranks >= low] += 1
+        ranks[row] = low
+
+    def _unrank_title(self, row):
+        # Drop row's rank, closing the gap if no other row shares it
+        ranks = self._title_ranks
+        rank = ranks[row]
+        ranks[row] = -1
+        if not np.count_nonzero(ranks == rank):
+            ranks[ranks > rank] -= 1
+
+    def copy(self):
+        # Independent copy of the columns and records to edit before publishing it;
+        # readers of this catalog never see a half-applied edit
+        catalog = Catalog.__new__(Catalog)
+        catalog.records = self.records.copy()
+        catalog.genres = list(self.genres)
+        catalog.genre_lookup = dict(self.genre_lookup)
+        catalog._title_ranks = None if self._title_ranks is None else self._title_ranks.copy()
+        catalog._row_by_id = None if self._row_by_id is None else dict(self._row_by_id)
+        catalog._positions = None if self._positions is None else self._positions.copy()
+        catalog.version = self.version
+        # Derived structures are never modified in place, so they can be shared
+        catalog._permutations = dict(self._permutations)
+        catalog._facets = dict(self._facets)
+        catalog._bitsets = self._bitsets
+        catalog._playable = dict(self._playable)
+        catalog._aggregates = None if self._aggregates is None else self._aggregates.copy()
+        for name, _ in COLUMNS:
+            setattr(catalog, name, getattr(self, name).copy())
+        catalog.live = self.live.copy()
+        return catalog
+
+    # Edits, used by the hot-reload watcher on a copy() that is not yet published
+    def add(self, content_type, content):
+        row = len(self.records)
+        for (name, dtype), value in zip(COLUMNS, self._row_values(content_type, content)):
+            setattr(self, name, np.append(getattr(self, name), np.array([value], dtype=dtype)))
+        self.live = np.append(self.live, True)
+        if self._positions is not None:
+            self._positions = np.append(self._positions, row)
+        self.records.append(content)
+        self.row_by_id[content['id']] = row
+        if self._title_ranks is not None:
+            self._title_ranks = np.append(self._title_ranks, -1)
+            self._rank_title(row, content['title'])
+        if self._aggregates is not None:
+            self._aggregates.add_row(self, row)
+        self._changed()
+        return row
+
+    def update(self, row, content_type, content):
+        if self._aggregates is not None:
+            self._aggregates.remove_row(self, row)
+        for (name, _), value in zip(COLUMNS, self._row_values(content_type, content)):
+            getattr(self, name)[row] = value
+        old_title = None if self._title_ranks is None else self.records[row]['title']
+        self.records[row] = content
+        if old_title is not None and old_title != content['title']:
+            self._unrank_title(row)
+            self._rank_title(row, content['title'])
+        if self._aggregates is not None:
+            self._aggregates.add_row(self, row)
+        self._changed()
+
+    def remove(self, row):
+        if self._aggregates is not None and self.live[row]:
+            self._aggregates.remove_row(self, row)
+        self.live[row] = False
+        self.row_by_id.pop(int(self.ids[row]), None)
+        # Sort permutations stay valid: removed rows are masked out by `live`
+        self._facets = {}
+        self._bitsets = None
+        self._playable = {}
+        self.version += 1
+
+    @property
+    def positions(self):
+        # File position of every row; ties in any order fall back to it
+        return np.arange(len(self.records)) if self._positions is None else self._positions
+
+    def file_positions(self, ids):
+        # Row positions for a file listing these live ids in order, or None if unchanged
+        positions = self.positions.copy()
+        positions[[self.row_by_id[content_id] for content_id in ids]] = np.arange(len(ids))
+        return None if np.array_equal(positions, self.positions) else positions
+
+    def reorder(self, positions):
+        self._positions = positions
+        self._changed()
+
+    def in_file_order(self, rows):
+        if self._positions is None:
+            return rows
+        return rows[np.argsort(self._positions[rows], kind='stable')]
+
+    def _changed(self):
+        self._permutations = {}
+        self._facets = {}
+        self._bitsets = None
+        self._playable = {}
+        self.version += 1
+
+    def record(self, row):
+        return self.records[row]
+
+    def lookup(self, content_id, content_type=None):
+        # (record, content type) for a live id, or None; optionally checks the type
+        row = self.row_by_id.get(content_id)
+        if row is None:
+            return None
+        found_type = self.content_type(row)
+        if content_type is not None and found_type != content_type:
+            return None
+        return self.records[row], found_type
+
+    def content_type(self, row):
+        return CONTENT_TYPES[self.types[row]]
+
+    def rows(self, content_type=None):
+        if content_type is None:
+            return np.flatnonzero(self.live)
+        return np.flatnonzero(self.live & (self.types == CONTENT_TYPES.index(content_type)))
+
+    def aggregates(self):
+        # Built on first use, then kept current by add/update/remove
+        if self._aggregates is None:
+            self._aggregates = CatalogAggregates(self)
+        return self._aggregates
+
+    def count(self, content_type=None):
+        counts = self.aggregates().counts
+        if content_type is None:
+            return sum(counts)
+        return counts[CONTENT_TYPES.index(content_type)]
+
+    def bitsets(self):
+        # Built once per catalog version
+        if self._bitsets is None:
+            self._bitsets = BitsetIndex(self)
+        return self._bitsets
+
+    def filter(self, content_type, genre_filter, year_range, rating_filter, language=None, quality=None):
+        return self.bitsets().filter(content_type, genre_filter, year_range, rating_filter, language, quality)
+
+    def facet_counts(self, content_type, year_range, rating_filter, language=None, quality=None):
+        return self.bitsets().genre_counts(content_type, year_range, rating_filter, language, quality)
+
+    def playable(self, language=None, quality=None):
+        # Mask of live rows available in the language and quality, once per version
+        key = (language, quality)
+        mask = self._playable.get(key)
+        if mask is None:
+            mask = self.live.copy()
+            if language is not None:
+                mask &= self.language_masks & preference_bit(language, LANGUAGES) != 0
+            if quality is not None:
+                mask &= self.quality_masks & preference_bit(quality, QUALITIES) != 0
+            self._playable[key] = mask
+        return mask
+
+    def playable_count(self, language=None, quality=None):
+        return int(np.count_nonzero(self.playable(language, quality)))
+
+    def sort_permutation(self, column, descending):
+        # All rows ordered by a column, ties in file order; computed once per version
+        key = (column, descending)
+        permutation = self._permutations.get(key)
+        if permutation is None:
+            values = getattr(self, column)
+            values = -values if descending else values
+            if self._positions is None:
+                permutation = np.argsort(values, kind='stable')
+            else:
+                permutation = np.lexsort((self._positions, values))
+            self._permutations[key] = permutation
+        return permutation
+
+    def sort(self, rows, sort_by, sort_order, limit=None):
+        if sort_by not in SORT_COLUMNS:
+            rows = self.in_file_order(rows)
+            return rows if limit is None else rows[:limit]
+        descending = sort_order == "Descending"
+        # Titles sort A-Z when the order is "Descending", matching the original UI
+        if sort_by == 'Title':
+            descending = not descending
+        permutation = self.sort_permutation(SORT_COLUMNS[sort_by], descending)
+
+        # Intersect the precomputed order with the filter result
+        selected = np.zeros(len(self.records), dtype=bool)
+        selected[rows] = True
+        if limit is None:
+            return permutation[selected[permutation]]
+
+        return self._head(permutation, selected, limit)
+
+    def _head(self, permutation, selected, limit):
+        # Only the head is needed: stop scanning once `limit` rows are found
+        found, count = [], 0
+        for start in range(0, len(permutation), SORT_CHUNK):
+            chunk = permutation[start:start + SORT_CHUNK]
+            hits = chunk[selected[chunk]]
+            found.append(hits)
+            count += len(hits)
+            if count >= limit:
+                break
+        return np.concatenate(found)[:limit] if found else permutation[:0]
+
+    def top_rated(self, k, content_type=None):
+        # Records of the k highest-rated live titles, ties in file order
+        if content_type is None:
+            rows = self.leading('ratings', k)
+        else:
+            rows = self.top(self.ratings, k, self.rows(content_type))
+        return [self.records[row] for row in rows]
+
+    def leading(self, column, k):
+        # The k live rows with the largest values of a column, from its cached order
+        return self._head(self.sort_permutation(column, True), self.live, k)
+
+    def top(self, values, k, rows=None):
+        # The k rows with the largest values, ties in file order, without a full sort
+        rows = self.in_file_order(self.rows() if rows is None else rows)
+        candidates = values[rows]
+        if k >= len(rows):
+            return rows[np.argsort(-candidates, kind='stable')]
+        if k <= 0:
+            return rows[:0]
+
+        kth = np.partition(candidates, len(candidates) - k)[len(candidates) - k]
+        above = np.flatnonzero(candidates > kth)
+        ties = np.flatnonzero(candidates == kth)[:k - len(above)]
+        chosen = np.sort(np.concatenate([above, ties]))
+        return rows[chosen[np.argsort(-candidates[chosen], kind='stable')]]
+
+    def average_rating(self, rows=None):
+        if rows is None:
+            aggregates = self.aggregates()
+            count = sum(aggregates.counts)
+            return aggregates.rating_sum / count if count else 0.0
+        ratings = self.ratings[rows]
+        return float(ratings.mean()) if len(ratings) else 0.0
+
+    def episode_count(self):
+        return self.aggregates().episodes[CONTENT_TYPES.index('tv_show')]
+
+    def rating_counts(self):
+        # {rating: number of live titles}
+        return dict(self.aggregates().rating_counts)
+
+    def facets(self, content_type=None):
+        # Built once per catalog version and content type
+        facets = self._facets.get(content_type)
+        if facets is None:
+            facets = self._facets[content_type] = FacetIndex(self, content_type)
+        return facets
+
+    def genre_showcase(self, per_genre):
+        # [(genre, titles, first per_genre (record, content type) in file order)],
+        # genres in order of their first title
+        groups = [(genre, self.in_file_order(rows)) for genre, rows in self.facets().genre_rows.items()]
+        positions = self.positions
+        groups.sort(key=lambda group: positions[group[1][0]])
+        return [(genre, len(rows), [(self.records[row], self.content_type(row)) for row in rows[:per_genre]])
+                for genre, rows in groups]
+
+    def distinct_genres(self, content_type=None):
+        return self.facets(content_type).genres
+
+    def distinct_years(self, content_type=None):
+        return self.facets(content_type).years
+
+    def genre_counts(self, rows=None):
+        if rows is None:
+            counts = self.aggregates().genre_counts
+        else:
+            counts = np.bincount(self.genre_codes[rows], minlength=len(self.genres))
+        return {genre: int(count) for genre, count in zip(self.genres, counts) if count}
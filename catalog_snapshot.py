@@ -0,0 +1,147 @@
+# Versioned binary catalog snapshot: fixed-width numeric columns plus
+# string tables, memory-mapped at startup instead of parsing JSON
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from catalog import COLUMNS, Catalog
+
+MAGIC = b'SFXCAT\x00\x00'
+FORMAT_VERSION = 3
+
+# magic, format version, header length
+PREAMBLE = struct.Struct('<8sII')
+ALIGNMENT = 64
+
+
+class RecordTable:
+    # Records stored as a string table of compact JSON, decoded on access.
+    # Patched and appended records from hot reloads live in `patched`.
+    def __init__(self, buffer, offsets, data_offset):
+        self.buffer = buffer
+        self.offsets = offsets
+        self.data_offset = data_offset
+        self.patched = {}
+        self.length = len(offsets) - 1
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, row):
+        row = int(row)
+        if row in self.patched:
+            return self.patched[row]
+        if not 0 <= row < len(self.offsets) - 1:
+            raise IndexError(row)
+        start = self.data_offset + int(self.offsets[row])
+        end = self.data_offset + int(self.offsets[row + 1])
+        return json.loads(self.buffer[start:end])
+
+    def __setitem__(self, row, content):
+        self.patched[int(row)] = content
+
+    def __iter__(self):
+        for row in range(self.length):
+            yield self[row]
+
+    def append(self, content):
+        self.patched[self.length] = content
+        self.length += 1
+
+    def copy(self):
+        # Shares the mapped table; patches made to the copy stay in the copy
+        table = RecordTable(self.buffer, self.offsets, self.data_offset)
+        table.patched = dict(self.patched)
+        table.length = self.length
+        return table
+
+
+def string_table(strings):
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype='<u8')
+    offsets[1:] = np.cumsum([len(s) for s in encoded])
+    return offsets, b''.join(encoded)
+
+
+def write_snapshot(content_data, path, source_signature=None):
+    catalog = Catalog(content_data)
+    sections = {}
+    for name, dtype in COLUMNS:
+        sections[name] = np.ascontiguousarray(getattr(catalog, name), dtype=np.dtype(dtype).newbyteorder('<'))
+    sections['title_ranks'] = catalog.title_ranks.astype('<i8')
+    genre_offsets, genre_data = string_table(catalog.genres)
+    sections['genres.offsets'] = genre_offsets
+    sections['genres.data'] = np.frombuffer(genre_data, dtype=np.uint8)
+    record_offsets, record_data = string_table(
+        json.dumps(content, separators=(',', ':')) for content in catalog.records
+    )
+    sections['records.offsets'] = record_offsets
+    sections['records.data'] = np.frombuffer(record_data, dtype=np.uint8)
+
+    # Lay the sections out after the header, each aligned for direct mapping
+    header = {'count': len(catalog.records), 'source': source_signature, 'sections': {}}
+    layout = []
+    header_room = 4096 + 128 * len(sections)
+    offset = PREAMBLE.size + header_room
+    for name, array in sections.items():
+        offset = -(-offset // ALIGNMENT) * ALIGNMENT
+        header['sections'][name] = {'dtype': array.dtype.str, 'offset': offset, 'length': len(array)}
+        layout.append((offset, array))
+        offset += array.nbytes
+
+    header_bytes = json.dumps(header).encode('utf-8')
+    if len(header_bytes) > header_room:
+        raise ValueError("Snapshot header too large")
+
+    # Write to a temporary file and swap it in, so readers never see a partial snapshot
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        for section_offset, array in layout:
+            f.seek(section_offset)
+            f.write(array.tobytes())
+    os.replace(tmp_path, path)
+    return len(catalog.records)
+
+
+def read_header(buffer):
+    magic, version, header_length = PREAMBLE.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        raise ValueError("Not a catalog snapshot")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot version {version}")
+    return json.loads(bytes(buffer[PREAMBLE.size:PREAMBLE.size + header_length]))
+
+
+def snapshot_source(path):
+    # Signature of the JSON file the snapshot was compiled from
+    with open(path, 'rb') as f:
+        preamble = f.read(PREAMBLE.size)
+        if len(preamble) < PREAMBLE.size:
+            raise ValueError("Not a catalog snapshot")
+        header_length = PREAMBLE.unpack(preamble)[2]
+        source = read_header(preamble + f.read(header_length))['source']
+    return tuple(source) if source is not None else None
+
+
+def load_snapshot(path):
+    with open(path, 'rb') as f:
+        # Copy-on-write, so hot-reload patches never touch the file on disk
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    header = read_header(buffer)
+
+    def section(name):
+        spec = header['sections'][name]
+        return np.frombuffer(buffer, dtype=np.dtype(spec['dtype']), count=spec['length'], offset=spec['offset'])
+
+    columns = {name: section(name) for name, _ in COLUMNS}
+    genre_offsets = section('genres.offsets')
+    genre_data = section('genres.data').tobytes()
+    genres = [genre_data[genre_offsets[i]:genre_offsets[i + 1]].decode('utf-8')
+              for i in range(len(genre_offsets) - 1)]
+    records = RecordTable(buffer, section('records.offsets'), header['sections']['records.data']['offset'])
+    return Catalog.from_columns(records, columns, genres, section('title_ranks'))
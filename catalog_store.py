@@ -0,0 +1,344 @@
+# SQLite-backed catalog store, shared on disk by every app worker process
+import json
+import math
+import sqlite3
+import threading
+import time
+
+from catalog import LANGUAGES, QUALITIES, bitmask, preference_bit
+from catalog_stream import iter_records
+from catalog_watcher import file_signature
+from trending import DECAY_RATE, MAX_EXPONENT, popularity
+
+# Bumped whenever the titles table changes shape; older stores are rebuilt
+SCHEMA_VERSION = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS titles (
+    id INTEGER PRIMARY KEY,
+    content_type TEXT NOT NULL,
+    title TEXT NOT NULL,
+    genre TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    rating REAL NOT NULL,
+    views INTEGER NOT NULL,
+    likes INTEGER NOT NULL,
+    total_episodes INTEGER NOT NULL,
+    language_mask INTEGER NOT NULL,
+    quality_mask INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    record TEXT NOT NULL,
+    -- Trending score scaled like TrendingEngine's: view events plus the file's
+    -- popularity, both relative to the trend_reference time in meta
+    events REAL NOT NULL DEFAULT 0,
+    trend REAL NOT NULL
+);
+-- Ties always fall back to file position ascending, so each sort column has an
+-- index per direction for the planner to walk under LIMIT
+CREATE INDEX IF NOT EXISTS idx_titles_genre ON titles (content_type, genre, rating DESC, position);
+CREATE INDEX IF NOT EXISTS idx_titles_year ON titles (content_type, year, position);
+CREATE INDEX IF NOT EXISTS idx_titles_year_desc ON titles (content_type, year DESC, position);
+CREATE INDEX IF NOT EXISTS idx_titles_rating ON titles (content_type, rating, position);
+CREATE INDEX IF NOT EXISTS idx_titles_rating_desc ON titles (content_type, rating DESC, position);
+CREATE INDEX IF NOT EXISTS idx_titles_views ON titles (content_type, views, position);
+CREATE INDEX IF NOT EXISTS idx_titles_views_desc ON titles (content_type, views DESC, position);
+CREATE INDEX IF NOT EXISTS idx_titles_title ON titles (content_type, title, position);
+CREATE INDEX IF NOT EXISTS idx_titles_title_desc ON titles (content_type, title DESC, position);
+CREATE INDEX IF NOT EXISTS idx_titles_trend ON titles (trend DESC, position);
+"""
+
+UPSERT = """
+INSERT INTO titles (id, content_type, title, genre, year, rating, views, likes, total_episodes,
+                    language_mask, quality_mask, position, record, trend)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (id) DO UPDATE SET
+    content_type = excluded.content_type, title = excluded.title, genre = excluded.genre,
+    year = excluded.year, rating = excluded.rating, views = excluded.views, likes = excluded.likes,
+    total_episodes = excluded.total_episodes, language_mask = excluded.language_mask,
+    quality_mask = excluded.quality_mask, position = excluded.position, record = excluded.record,
+    trend = excluded.trend + titles.events
+WHERE titles.record != excluded.record OR titles.position != excluded.position
+    OR titles.content_type != excluded.content_type
+"""
+
+SORT_COLUMNS = {
+    'Rating': 'rating',
+    'Year': 'year',
+    'Views': 'views',
+    'Title': 'title',
+}
+
+BATCH_SIZE = 5000
+
+
+class CatalogStore:
+    def __init__(self, path, source_path, clock=time.time):
+        self.path = path
+        self.source_path = source_path
+        self.clock = clock
+        self.local = threading.local()
+        self.sync_lock = threading.Lock()
+        self.source_signature = None
+        self._cache = (None, {})
+
+        conn = self.connection()
+        if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            # Store from an older release: drop it and reload from the JSON database
+            conn.executescript("DROP TABLE IF EXISTS titles; DROP TABLE IF EXISTS meta;")
+        conn.executescript(SCHEMA)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        # The file's popularity counts as of store creation, decaying like any other view
+        now = json.dumps(clock())
+        conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('trend_reference', ?), ('trend_loaded', ?)",
+                     (now, now))
+        self.sync()
+
+    def connection(self):
+        # sqlite3 connections are per thread; Streamlit runs sessions on many threads
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def stored_source(self):
+        row = self.connection().execute("SELECT value FROM meta WHERE key = 'source'").fetchone()
+        return tuple(json.loads(row[0])) if row and row[0] != 'null' else None
+
+    def meta(self, key):
+        return json.loads(self.connection().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()[0])
+
+    @property
+    def version(self):
+        # Changes whenever the store is synced to a new version of the source
+        return self.source_signature
+
+    def sync(self):
+        # Bring the store up to date with the JSON database, patching only changed
+        # records. Safe to call from several processes: the write lock serialises
+        # them and later callers find the store already current.
+        signature = file_signature(self.source_path)
+        if signature is None or signature == self.source_signature:
+            return False
+
+        with self.sync_lock:
+            conn = self.connection()
+            if self.stored_source() == signature:
+                self.source_signature = signature
+                return False
+
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self.stored_source() != signature:
+                    self._load(conn)
+                    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('source', ?)",
+                                 (json.dumps(signature),))
+                    # Fresh statistics let the planner walk the sort index under LIMIT
+                    conn.execute("ANALYZE")
+                conn.execute("COMMIT")
+            except (FileNotFoundError, ValueError):
+                # Missing or half-written file: keep serving and retry later
+                conn.execute("ROLLBACK")
+                return False
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            self.source_signature = signature
+            return True
+
+    def _load(self, conn):
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS seen (id INTEGER PRIMARY KEY)")
+        conn.execute("DELETE FROM seen")
+        # Edits re-score against the load time, so they never look like fresh views
+        loaded_growth = self._growth(self.meta('trend_loaded'))
+        batch = []
+        for position, (content_type, content, _) in enumerate(iter_records(self.source_path)):
+            batch.append((
+                content['id'], content_type, content['title'], content['genre'], content['year'],
+                content['rating'], content.get('views', 0), content.get('likes', 0),
+                content.get('total_episodes', 0), bitmask(content.get('languages'), LANGUAGES),
+                bitmask(content.get('quality'), QUALITIES), position, json.dumps(content, separators=(',', ':')),
+                popularity(content) * loaded_growth,
+            ))
+            if len(batch) >= BATCH_SIZE:
+                self._write_batch(conn, batch)
+                batch = []
+        self._write_batch(conn, batch)
+        conn.execute("DELETE FROM titles WHERE id NOT IN (SELECT id FROM seen)")
+
+    def _write_batch(self, conn, batch):
+        conn.executemany(UPSERT, batch)
+        conn.executemany("INSERT OR IGNORE INTO seen (id) VALUES (?)", [(values[0],) for values in batch])
+
+    def _where(self, content_type, genre_filter, year_range, rating_filter, language=None, quality=None):
+        # Unary + keeps the range filters off the index choice, so the planner
+        # walks the sort column's index in order and can stop at LIMIT
+        clauses = ["content_type = ?", "+year BETWEEN ? AND ?", "+rating >= ?"]
+        params = [content_type, year_range[0], year_range[1], rating_filter]
+        if genre_filter != "All":
+            clauses.append("genre = ?")
+            params.append(genre_filter)
+        preference_clauses, preference_params = self._preferences(language, quality)
+        return " AND ".join(clauses + preference_clauses), params + preference_params
+
+    def _preferences(self, language, quality):
+        clauses, params = [], []
+        if language is not None:
+            clauses.append("(language_mask & ?) != 0")
+            params.append(preference_bit(language, LANGUAGES))
+        if quality is not None:
+            clauses.append("(quality_mask & ?) != 0")
+            params.append(preference_bit(quality, QUALITIES))
+        return clauses, params
+
+    def query(self, content_type, genre_filter, year_range, rating_filter, sort_by, sort_order,
+              limit=None, offset=0, language=None, quality=None):
+        where, params = self._where(content_type, genre_filter, year_range, rating_filter, language, quality)
+        conn = self.connection()
+        total = conn.execute(f"SELECT COUNT(*) FROM titles WHERE {where}", params).fetchone()[0]
+
+        direction = "DESC" if sort_order == "Descending" else "ASC"
+        # Titles sort A-Z when the order is "Descending", matching the original UI
+        if sort_by == 'Title':
+            direction = "ASC" if direction == "DESC" else "DESC"
+        # Equal values keep their file order either way, like the in-memory stable sort
+        order = f"{SORT_COLUMNS[sort_by]} {direction}, position" if sort_by in SORT_COLUMNS else "position"
+        sql = f"SELECT record FROM titles WHERE {where} ORDER BY {order}"
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params = params + [limit, offset]
+        return total, [json.loads(record) for (record,) in conn.execute(sql, params)]
+
+    def cached(self, key, compute):
+        # Computed once per synced source version
+        signature, values = self._cache
+        if signature != self.source_signature:
+            values = {}
+            self._cache = (self.source_signature, values)
+        if key not in values:
+            values[key] = compute()
+        return values[key]
+
+    def totals(self):
+        # {content_type: (titles, episodes)}
+        return self.cached('totals', lambda: {row[0]: row[1:] for row in self.connection().execute(
+            "SELECT content_type, COUNT(*), COALESCE(SUM(total_episodes), 0) FROM titles GROUP BY content_type")})
+
+    def count(self, content_type=None):
+        totals = self.totals()
+        if content_type is None:
+            return sum(titles for titles, _ in totals.values())
+        return totals.get(content_type, (0, 0))[0]
+
+    def episode_count(self):
+        return self.totals().get('tv_show', (0, 0))[1]
+
+    def facet_counts(self, content_type, year_range, rating_filter, language=None, quality=None):
+        where, params = self._where(content_type, "All", year_range, rating_filter, language, quality)
+        return dict(self.connection().execute(
+            f"SELECT genre, COUNT(*) FROM titles WHERE {where} GROUP BY genre", params).fetchall())
+
+    def distinct_genres(self, content_type):
+        return [genre for (genre,) in self.connection().execute(
+            "SELECT DISTINCT genre FROM titles WHERE content_type = ? ORDER BY genre", (content_type,))]
+
+    def distinct_years(self, content_type):
+        return [year for (year,) in self.connection().execute(
+            "SELECT DISTINCT year FROM titles WHERE content_type = ? ORDER BY year", (content_type,))]
+
+    def average_rating(self):
+        return self.cached('average_rating', lambda: self.connection().execute(
+            "SELECT COALESCE(AVG(rating), 0.0) FROM titles").fetchone()[0])
+
+    def genre_counts(self):
+        return self.cached('genre_counts', lambda: dict(self.connection().execute(
+            "SELECT genre, COUNT(*) FROM titles GROUP BY genre ORDER BY MIN(position)").fetchall()))
+
+    def rating_counts(self):
+        # {rating: number of titles}
+        return self.cached('rating_counts', lambda: dict(self.connection().execute(
+            "SELECT rating, COUNT(*) FROM titles GROUP BY rating").fetchall()))
+
+    def top_rated(self, k, content_type=None):
+        # Records of the k highest-rated titles, ties in file order
+        def compute():
+            where, params = ("WHERE content_type = ?", [content_type]) if content_type else ("", [])
+            return [json.loads(record) for (record,) in self.connection().execute(
+                f"SELECT record FROM titles {where} ORDER BY rating DESC, position LIMIT ?", params + [k])]
+        return self.cached(('top_rated', k, content_type), compute)
+
+    def genre_showcase(self, per_genre):
+        # [(genre, titles, first per_genre (record, content type) in file order)],
+        # genres in order of first appearance
+        def compute():
+            conn = self.connection()
+            genres = conn.execute("SELECT genre, COUNT(*) FROM titles GROUP BY genre ORDER BY MIN(position)").fetchall()
+            return [(genre, count, [(json.loads(record), content_type) for record, content_type in conn.execute(
+                "SELECT record, content_type FROM titles WHERE genre = ? ORDER BY position LIMIT ?",
+                (genre, per_genre))]) for genre, count in genres]
+        return self.cached(('genre_showcase', per_genre), compute)
+
+    def lookup(self, content_id, content_type=None):
+        # (record, content type) for an id, or None; optionally checks the type
+        row = self.connection().execute("SELECT record, content_type FROM titles WHERE id = ?",
+                                        (content_id,)).fetchone()
+        if row is None or content_type is not None and row[1] != content_type:
+            return None
+        return json.loads(row[0]), row[1]
+
+    # Trending, shared by every worker: scores are stored relative to a reference
+    # time and scaled by exp(rate * (t - reference)), as in TrendingEngine
+    def _growth(self, timestamp, reference=None):
+        if reference is None:
+            reference = self.meta('trend_reference')
+        return math.exp(DECAY_RATE * (timestamp - reference))
+
+    def record_view(self, content_id, count=1):
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = self.clock()
+            reference = self.meta('trend_reference')
+            if DECAY_RATE * (now - reference) > MAX_EXPONENT:
+                # Re-anchor stored scores before the growth factor overflows
+                factor = 1 / self._growth(now, reference)
+                conn.execute("UPDATE titles SET events = events * ?, trend = trend * ?", (factor, factor))
+                conn.execute("UPDATE meta SET value = ? WHERE key = 'trend_reference'", (json.dumps(now),))
+                reference = now
+            weight = count * self._growth(now, reference) / 1000
+            conn.execute("UPDATE titles SET events = events + rating * ?, trend = trend + rating * ? WHERE id = ?",
+                         (weight, weight, content_id))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def trending(self, k, language=None, quality=None):
+        # [(record, content type, current decayed score)] of the k top-trending titles
+        # playable in the language and quality
+        where, params = self._playable(language, quality)
+        conn = self.connection()
+        # One read transaction, so a concurrent re-anchor cannot split scores and reference
+        conn.execute("BEGIN")
+        try:
+            rows = conn.execute(
+                f"SELECT record, content_type, trend FROM titles {where} ORDER BY trend DESC, position LIMIT ?",
+                params + [k]).fetchall()
+            growth = self._growth(self.clock())
+        finally:
+            conn.execute("COMMIT")
+        return [(json.loads(record), content_type, trend / growth) for record, content_type, trend in rows]
+
+    def playable_count(self, language=None, quality=None):
+        where, params = self._playable(language, quality)
+        return self.connection().execute(f"SELECT COUNT(*) FROM titles {where}", params).fetchone()[0]
+
+    def _playable(self, language, quality):
+        clauses, params = self._preferences(language, quality)
+        return ("WHERE " + " AND ".join(clauses) if clauses else ""), params
@@ -0,0 +1,144 @@
+# Streaming catalog loader for content databases larger than RAM.
+# Records are parsed one at a time; only the numeric columns stay in memory
+# and the full records (descriptions, episode lists, ...) are spilled to a
+# private file that is memory-mapped and decoded on demand.
+import json
+import mmap
+import re
+import tempfile
+from array import array
+
+import numpy as np
+
+from catalog import COLUMNS, SECTIONS, Catalog, dense_ranks
+from catalog_snapshot import RecordTable
+
+CHUNK_SIZE = 1 << 20
+
+SECTION_TYPES = {section: content_type for content_type, section in SECTIONS.items()}
+
+# array typecodes matching the COLUMNS dtypes
+ARRAY_TYPECODES = {
+    np.int8: 'b',
+    np.int32: 'i',
+    np.int64: 'q',
+    np.float64: 'd',
+}
+
+WHITESPACE = re.compile(r'\s*')
+DECODER = json.JSONDecoder()
+
+
+class JSONStreamReader:
+    def __init__(self, f):
+        self.f = f
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        chunk = self.f.read(CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        while True:
+            self.pos = WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ''
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected {char!r} but found {found!r}")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                obj, end = DECODER.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                # Most likely a value cut off at the end of the buffer
+                if not self.fill():
+                    raise
+                continue
+            # A number at the very end of the buffer may continue in the next chunk
+            if end == len(self.buffer) and not self.eof and self.fill():
+                continue
+            text = self.buffer[self.pos:end]
+            self.pos = end
+            return obj, text
+
+
+def iter_records(path):
+    # Yields (content_type, content, raw JSON text) in file order
+    with open(path, 'r', encoding='utf-8') as f:
+        reader = JSONStreamReader(f)
+        reader.expect('{')
+        if reader.peek() == '}':
+            return
+        while True:
+            key, _ = reader.value()
+            reader.expect(':')
+            content_type = SECTION_TYPES.get(key)
+            if content_type is None or reader.peek() != '[':
+                # Unknown top-level entries are skipped whole
+                reader.value()
+            else:
+                reader.expect('[')
+                if reader.peek() == ']':
+                    reader.pos += 1
+                else:
+                    while True:
+                        content, text = reader.value()
+                        yield content_type, content, text
+                        separator = reader.peek()
+                        reader.pos += 1
+                        if separator == ']':
+                            break
+                        if separator != ',':
+                            raise ValueError(f"Expected ',' or ']' but found {separator!r}")
+            separator = reader.peek()
+            reader.pos += 1
+            if separator == '}':
+                return
+            if separator != ',':
+                raise ValueError(f"Expected ',' or '}}' but found {separator!r}")
+
+
+def stream_catalog(path):
+    builder = Catalog({})
+    columns = {name: array(ARRAY_TYPECODES[dtype]) for name, dtype in COLUMNS}
+    offsets = array('Q', [0])
+    titles = []
+    spill = tempfile.TemporaryFile()
+
+    for content_type, content, text in iter_records(path):
+        for (name, _), value in zip(COLUMNS, builder._row_values(content_type, content)):
+            columns[name].append(value)
+        titles.append(content['title'])
+        raw = text.encode('utf-8')
+        spill.write(raw)
+        offsets.append(offsets[-1] + len(raw))
+
+    spill.flush()
+    title_ranks = dense_ranks(titles)
+    del titles
+
+    if offsets[-1]:
+        # The mapping keeps the (already unlinked) spill file alive on its own
+        buffer = mmap.mmap(spill.fileno(), 0, access=mmap.ACCESS_READ)
+        records = RecordTable(buffer, np.frombuffer(offsets, dtype=np.uint64), 0)
+    else:
+        records = []
+    spill.close()
+
+    numeric = {name: np.array(columns[name], dtype=dtype) for name, dtype in COLUMNS}
+    return Catalog.from_columns(records, numeric, builder.genres, title_ranks)
@@ -0,0 +1,45 @@
+# Pre-rendered chart images, kept in a bounded LRU so reruns never redraw them
+import io
+import threading
+from collections import OrderedDict
+
+MAX_CHARTS = 16
+
+
+def render_png(draw, figsize=(6.4, 4.8)):
+    # Imported here so matplotlib only loads once a chart is actually drawn
+    from matplotlib.figure import Figure
+
+    # A bare Figure is never registered with pyplot, so nothing outlives this call
+    fig = Figure(figsize=figsize)
+    try:
+        draw(fig.add_subplot())
+        fig.tight_layout()
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format='png')
+        return buffer.getvalue()
+    finally:
+        fig.clear()
+
+
+class ChartCache:
+    def __init__(self, max_entries=MAX_CHARTS):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, draw):
+        # PNG bytes for `key`, drawing them with draw(ax) on a miss
+        with self.lock:
+            png = self.entries.get(key)
+            if png is not None:
+                self.entries.move_to_end(key)
+                return png
+
+        png = render_png(draw)
+        with self.lock:
+            self.entries[key] = png
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return png
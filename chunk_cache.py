@@ -0,0 +1,129 @@
+# Process-wide LRU cache of fixed-size video chunks, shared by every viewer.
+# Concurrent misses for the same chunk are coalesced into a single disk read.
+import threading
+from collections import OrderedDict
+
+CHUNK_SIZE = 1 << 20
+
+
+def file_key(path, stat):
+    # Identifies one version of a file: a replaced or edited file gets fresh chunks
+    return (path, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+class PendingRead:
+    def __init__(self):
+        self.done = threading.Event()
+        self.data = None
+        self.error = None
+
+
+class ChunkCache:
+    def __init__(self, max_bytes, chunk_size=CHUNK_SIZE):
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.chunks = OrderedDict()
+        self.pending = {}
+        self.size = 0
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.prefetches = 0
+        self.bytes_read = 0
+        self.bytes_served = 0
+
+    def chunk(self, key, load, prefetch=False):
+        # Cached bytes for key; on a miss exactly one caller runs load().
+        # Prefetches are left out of the hit and miss counts.
+        with self.lock:
+            data = self.chunks.get(key)
+            if data is not None:
+                self.chunks.move_to_end(key)
+                self.hits += not prefetch
+                return data
+            pending = self.pending.get(key)
+            owner = pending is None
+            if owner:
+                pending = self.pending[key] = PendingRead()
+                if prefetch:
+                    self.prefetches += 1
+                else:
+                    self.misses += 1
+            else:
+                self.coalesced += not prefetch
+
+        if not owner:
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.data
+
+        try:
+            data = load()
+        except BaseException as e:
+            with self.lock:
+                del self.pending[key]
+            pending.error = e
+            pending.done.set()
+            raise
+
+        with self.lock:
+            self.bytes_read += len(data)
+            self.chunks[key] = data
+            self.size += len(data)
+            while self.size > self.max_bytes and self.chunks:
+                _, evicted = self.chunks.popitem(last=False)
+                self.size -= len(evicted)
+                self.evictions += 1
+            del self.pending[key]
+        pending.data = data
+        pending.done.set()
+        return data
+
+    def loader(self, f, offset):
+        def load():
+            f.seek(offset)
+            return f.read(self.chunk_size)
+        return load
+
+    def iter_range(self, f, file_id, start, end):
+        # Bytes start..end (inclusive) of an open file as memoryviews, chunk by chunk.
+        # file_id must change whenever the file does (see file_key()).
+        while start <= end:
+            offset = start - start % self.chunk_size
+            piece = memoryview(self.chunk((file_id, offset), self.loader(f, offset)))[start - offset:end - offset + 1]
+            if not piece:
+                # File shrank under us
+                return
+            with self.lock:
+                self.bytes_served += len(piece)
+            yield piece
+            start = offset + self.chunk_size
+
+    def warm(self, f, file_id, start, end):
+        # Load the chunks covering start..end ahead of any request for them
+        offset = start - start % self.chunk_size
+        while offset <= end:
+            self.chunk((file_id, offset), self.loader(f, offset), prefetch=True)
+            offset += self.chunk_size
+
+    def stats(self):
+        with self.lock:
+            requests = self.hits + self.misses + self.coalesced
+            return {
+                'requests': requests,
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                # Share of chunk requests that did not need their own disk read
+                'hit_rate': (self.hits + self.coalesced) / requests if requests else 0.0,
+                'evictions': self.evictions,
+                'prefetches': self.prefetches,
+                'bytes_read': self.bytes_read,
+                'bytes_served': self.bytes_served,
+                'cached_bytes': self.size,
+                'cached_chunks': len(self.chunks),
+            }
@@ -0,0 +1,155 @@
+# Move the 'moov' index of MP4 files in front of the media data, so browsers can
+# start playback from the first bytes instead of fetching the end of the file first
+import json
+import os
+import shutil
+import struct
+import sys
+import time
+from bisect import bisect_right
+
+from mp4_boxes import BoxTree, read_payload, top_level_boxes
+from video_server import local_video_path
+
+COPY_SIZE = 1 << 20
+
+
+def layout(path):
+    # (top-level boxes, moov box, first mdat box) of an MP4 file
+    with open(path, 'rb') as f:
+        boxes = top_level_boxes(f)
+    moov = next((box for box in boxes if box.type == b'moov'), None)
+    mdat = next((box for box in boxes if box.type == b'mdat'), None)
+    if moov is None:
+        raise ValueError("No 'moov' box (not an MP4 file, or a fragmented one)")
+    return boxes, moov, mdat
+
+
+def is_faststart(path):
+    _, moov, mdat = layout(path)
+    return mdat is None or moov.offset < mdat.offset
+
+
+def chunk_offsets(node):
+    count = struct.unpack_from('>I', node.payload, 4)[0]
+    code = '>%dI' if node.type == b'stco' else '>%dQ'
+    return list(struct.unpack_from(code % count, node.payload, 8))
+
+
+def offset_tables(payload, offsets):
+    # stco while every offset fits in 32 bits, co64 otherwise
+    if not offsets or max(offsets) <= 0xFFFFFFFF:
+        return b'stco', payload[:4] + struct.pack('>I%dI' % len(offsets), len(offsets), *offsets)
+    return b'co64', payload[:4] + struct.pack('>I%dQ' % len(offsets), len(offsets), *offsets)
+
+
+def faststart(path, output=None):
+    # Rewrite path (in place unless output is given) with moov first. False if it already was.
+    boxes, moov, mdat = layout(path)
+    if mdat is None or moov.offset < mdat.offset:
+        return False
+
+    with open(path, 'rb') as f:
+        tree = BoxTree.parse(read_payload(f, moov), b'moov')
+    if any(node.type == b'cmov' for node in tree.walk()):
+        raise ValueError("Compressed 'moov' boxes are not supported")
+
+    # Boxes before the media data keep their place; moov goes right after them
+    head = [box for box in boxes if box.offset < mdat.offset]
+    tail = [box for box in boxes if box.offset >= mdat.offset and box is not moov]
+    tables = [(node, chunk_offsets(node)) for node in tree.walk() if node.type in (b'stco', b'co64')]
+    starts = [box.offset for box in head + tail]
+
+    # Widening a table to co64 grows moov, which moves the data again, so settle sizes first
+    while True:
+        moov_size = len(tree.to_bytes())
+        shifts = [0] * len(head)
+        position = sum(box.size for box in head) + moov_size
+        for box in tail:
+            shifts.append(position - box.offset)
+            position += box.size
+        resized = False
+        for node, offsets in tables:
+            moved = []
+            for offset in offsets:
+                i = bisect_right(starts, offset) - 1
+                if i < 0:
+                    raise ValueError(f"Chunk offset {offset} points before the first box")
+                moved.append(offset + shifts[i])
+            box_type, node.payload = offset_tables(node.payload, moved)
+            resized |= box_type != node.type
+            node.type = box_type
+        if not resized:
+            break
+
+    target = output or path + '.faststart'
+    try:
+        with open(path, 'rb') as src, open(target, 'wb') as dst:
+            for box in head:
+                copy_range(src, dst, box.offset, box.size)
+            dst.write(tree.to_bytes())
+            for box in tail:
+                copy_range(src, dst, box.offset, box.size)
+        shutil.copymode(path, target)
+        if output is None:
+            os.replace(target, path)
+    except BaseException:
+        if output is None and os.path.exists(target):
+            os.remove(target)
+        raise
+    return True
+
+
+def copy_range(src, dst, offset, length):
+    src.seek(offset)
+    while length:
+        data = src.read(min(COPY_SIZE, length))
+        if not data:
+            raise ValueError("File ended inside a box")
+        dst.write(data)
+        length -= len(data)
+
+
+def local_videos(content_data, root='.'):
+    # Distinct local files referenced by titles and episodes, in catalog order
+    urls = []
+    for key in ('movies', 'tv_shows'):
+        for item in content_data.get(key, []):
+            urls.append(item.get('video_url'))
+            urls.extend(episode.get('video_url') for episode in item.get('episodes', []))
+    paths = []
+    for url in urls:
+        path = local_video_path(url, root) if url else None
+        if path is not None and path not in paths:
+            paths.append(path)
+    return paths
+
+
+def main():
+    source = sys.argv[1] if len(sys.argv) > 1 else 'content_database.json'
+    root = sys.argv[2] if len(sys.argv) > 2 else os.path.dirname(os.path.abspath(source))
+
+    with open(source, 'r') as f:
+        content_data = json.load(f)
+
+    start = time.perf_counter()
+    rewritten = failed = 0
+    for path in local_videos(content_data, root):
+        if os.path.splitext(path)[1].lower() not in ('.mp4', '.m4v', '.mov'):
+            continue
+        try:
+            if faststart(os.path.join(root, path)):
+                rewritten += 1
+                print(f"  {path}: moved moov to the front")
+            else:
+                print(f"  {path}: already fast-start")
+        except (OSError, ValueError, struct.error) as e:
+            failed += 1
+            print(f"  {path}: skipped ({e})")
+
+    print(f"Rewrote {rewritten} video(s) in {time.perf_counter() - start:.2f}s" + (f", {failed} failed" if failed else ""))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
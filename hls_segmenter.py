@@ -0,0 +1,456 @@
+# Split local MP4 files at keyframes into fragmented-MP4 segments with an HLS
+# playlist per rendition, so players fetch a few seconds at a time and can seek
+# without one large range request. Every rendition of a title is cut at the same
+# times; the renditions produced are recorded in each output's source.json, and
+# with --update-quality added to the catalog. Assets whose sources are unchanged
+# are skipped. A pinned hls.js is saved next to the output
+# so the app serves the player itself rather than loading it from a CDN.
+import hashlib
+import json
+import math
+import os
+import shutil
+import struct
+import sys
+import time
+from bisect import bisect_left
+
+from catalog import QUALITIES
+from faststart import local_videos
+from mp4_boxes import BoxTree, box_bytes, read_payload, top_level_boxes
+from mp4_probe import full_box_times, probe, rendition_sources
+from video_server import local_video_path
+
+HLS_DIR = 'hls'
+MASTER_PLAYLIST = 'master.m3u8'
+RENDITION_PLAYLIST = 'index.m3u8'
+INIT_SEGMENT = 'init.mp4'
+STATE_FILE = 'source.json'
+HLS_JS_VERSION = '1.5.20'
+HLS_JS_URL = f'https://cdn.jsdelivr.net/npm/hls.js@{HLS_JS_VERSION}/dist/hls.min.js'
+HLS_JS = os.path.join(HLS_DIR, f'hls-{HLS_JS_VERSION}.min.js')
+# sha256 of the release's dist/hls.min.js, to be recorded whenever HLS_JS_VERSION
+# changes; until then nothing downloaded is accepted
+HLS_JS_SHA256 = None
+SEGMENT_SECONDS = 6
+# Bump when the output layout changes, so existing segments are rebuilt
+SEGMENTER_VERSION = 2
+# Keyframes of different renditions this close together count as the same cut point
+ALIGN_TOLERANCE = 0.05
+
+# Sample flags (ISO/IEC 14496-12 8.8.3.1): keyframes depend on nothing, others are non-sync
+SYNC_SAMPLE = 0x02000000
+NON_SYNC_SAMPLE = 0x01010000
+
+# Sample table boxes that only describe the progressive layout
+PROGRESSIVE_TABLES = {b'stts', b'ctts', b'stss', b'stsc', b'stsz', b'stz2', b'stco', b'co64',
+                      b'sgpd', b'sbgp', b'sdtp', b'stps', b'cslg'}
+
+
+class Track:
+    # Flattened sample table of one trak: per-sample duration, size, file offset
+    def __init__(self, trak):
+        tkhd = trak.child(b'tkhd').payload
+        self.track_id = struct.unpack_from('>I', tkhd, 20 if tkhd[0] == 1 else 12)[0]
+        self.timescale = full_box_times(trak.find([b'mdia', b'mdhd']).payload)[0]
+        self.handler = trak.find([b'mdia', b'hdlr']).payload[8:12]
+        stbl = trak.find([b'mdia', b'minf', b'stbl'])
+
+        stsz = stbl.child(b'stsz')
+        if stsz is None:
+            raise ValueError("Compact sample sizes (stz2) are not supported")
+        uniform, count = struct.unpack_from('>II', stsz.payload, 4)
+        self.sizes = [uniform] * count if uniform else list(struct.unpack_from('>%dI' % count, stsz.payload, 12))
+
+        self.durations = []
+        stts = stbl.child(b'stts').payload
+        for i in range(struct.unpack_from('>I', stts, 4)[0]):
+            run, delta = struct.unpack_from('>II', stts, 8 + 8 * i)
+            self.durations.extend([delta] * run)
+        self.decode_times = [0] * count
+        for i in range(1, count):
+            self.decode_times[i] = self.decode_times[i - 1] + self.durations[i - 1]
+
+        self.composition_offsets = None
+        ctts = stbl.child(b'ctts')
+        if ctts is not None:
+            self.composition_offsets = []
+            for i in range(struct.unpack_from('>I', ctts.payload, 4)[0]):
+                run, offset = struct.unpack_from('>Ii', ctts.payload, 8 + 8 * i)
+                self.composition_offsets.extend([offset] * run)
+
+        stss = stbl.child(b'stss')
+        self.sync = None
+        if stss is not None:
+            entries = struct.unpack_from('>I', stss.payload, 4)[0]
+            self.sync = {number - 1 for number in struct.unpack_from('>%dI' % entries, stss.payload, 8)}
+
+        chunks = stbl.child(b'stco') or stbl.child(b'co64')
+        entries = struct.unpack_from('>I', chunks.payload, 4)[0]
+        code = '>%dI' if chunks.type == b'stco' else '>%dQ'
+        chunk_offsets = struct.unpack_from(code % entries, chunks.payload, 8)
+        stsc = stbl.child(b'stsc').payload
+        runs = [struct.unpack_from('>II', stsc, 8 + 12 * i) for i in range(struct.unpack_from('>I', stsc, 4)[0])]
+        self.offsets = []
+        sample = 0
+        for i, (first_chunk, per_chunk) in enumerate(runs):
+            last_chunk = runs[i + 1][0] - 1 if i + 1 < len(runs) else len(chunk_offsets)
+            for chunk in range(first_chunk - 1, last_chunk):
+                offset = chunk_offsets[chunk]
+                for size in self.sizes[sample:sample + per_chunk]:
+                    self.offsets.append(offset)
+                    offset += size
+                sample += per_chunk
+        if len(self.offsets) != count or len(self.durations) != count:
+            raise ValueError(f"Inconsistent sample tables in track {self.track_id}")
+
+    def is_sync(self, sample):
+        return self.sync is None or sample in self.sync
+
+    def seconds(self, sample):
+        return self.decode_times[sample] / self.timescale
+
+
+def init_segment(moov, tracks):
+    # ftyp + moov with empty sample tables and an mvex announcing fragments
+    for trak in moov.children:
+        if trak.type != b'trak':
+            continue
+        stbl = trak.find([b'mdia', b'minf', b'stbl'])
+        stbl.children = [child for child in stbl.children if child.type not in PROGRESSIVE_TABLES]
+        stbl.children += [
+            BoxTree(b'stts', payload=bytes(8)),
+            BoxTree(b'stsc', payload=bytes(8)),
+            BoxTree(b'stsz', payload=bytes(12)),
+            BoxTree(b'stco', payload=bytes(8)),
+        ]
+    trex = [BoxTree(b'trex', payload=struct.pack('>IIIIII', 0, track.track_id, 1, 0, 0, 0)) for track in tracks]
+    moov.children = [child for child in moov.children if child.type != b'mvex'] + [BoxTree(b'mvex', children=trex)]
+    ftyp = box_bytes(b'ftyp', b'iso6' + struct.pack('>I', 0) + b'iso6mp41')
+    return ftyp + moov.to_bytes()
+
+
+def media_segment(f, sequence, runs):
+    # moof + mdat for (track, first sample, end sample) runs, samples copied from f
+    def moof(data_offsets):
+        trafs = []
+        for (track, first, end), data_offset in zip(runs, data_offsets):
+            offsets = track.composition_offsets
+            flags = 0x000701 | (0x000800 if offsets else 0)
+            version = 1 if offsets and min(offsets[first:end], default=0) < 0 else 0
+            samples = []
+            for i in range(first, end):
+                samples.append(struct.pack('>III', track.durations[i], track.sizes[i],
+                                           SYNC_SAMPLE if track.is_sync(i) else NON_SYNC_SAMPLE))
+                if offsets:
+                    samples.append(struct.pack('>i', offsets[i]))
+            trafs.append(box_bytes(b'traf', b''.join([
+                # default-base-is-moof: data offsets count from the start of this moof
+                box_bytes(b'tfhd', struct.pack('>II', 0x020000, track.track_id)),
+                box_bytes(b'tfdt', struct.pack('>IQ', 1 << 24, track.decode_times[first])),
+                box_bytes(b'trun', struct.pack('>IIi', (version << 24) | flags, end - first, data_offset)
+                          + b''.join(samples)),
+            ])))
+        return box_bytes(b'moof', box_bytes(b'mfhd', struct.pack('>II', 0, sequence)) + b''.join(trafs))
+
+    run_sizes = [sum(track.sizes[first:end]) for track, first, end in runs]
+    header = len(moof([0] * len(runs))) + 8
+    data_offsets = [header + sum(run_sizes[:i]) for i in range(len(runs))]
+    data = bytearray()
+    for track, first, end in runs:
+        for i in range(first, end):
+            f.seek(track.offsets[i])
+            data += f.read(track.sizes[i])
+    return moof(data_offsets) + box_bytes(b'mdat', bytes(data))
+
+
+def read_tracks(f):
+    # (moov tree, tracks with samples, video track or else the first one)
+    moov_box = next((box for box in top_level_boxes(f) if box.type == b'moov'), None)
+    if moov_box is None:
+        raise ValueError("No 'moov' box")
+    moov = BoxTree.parse(read_payload(f, moov_box), b'moov')
+    tracks = [Track(trak) for trak in moov.children if trak.type == b'trak']
+    tracks = [track for track in tracks if track.sizes]
+    if not tracks:
+        raise ValueError("No samples to segment")
+    return moov, tracks, next((track for track in tracks if track.handler == b'vide'), tracks[0])
+
+
+def keyframe_times(reference):
+    # Times a segment may start at; the first sample always starts one
+    return [reference.seconds(i) for i in range(len(reference.sizes)) if i == 0 or reference.is_sync(i)]
+
+
+def source_keyframes(source):
+    with open(source, 'rb') as f:
+        return keyframe_times(read_tracks(f)[2])
+
+
+def nearest(times, t):
+    i = bisect_left(times, t)
+    return min(times[max(i - 1, 0):i + 1], key=lambda time: abs(time - t))
+
+
+def segment_boundaries(keyframes, target_seconds):
+    # Segment start times: the first keyframe at least target_seconds after the last start
+    starts = [keyframes[0]]
+    for t in keyframes[1:]:
+        if t - starts[-1] >= target_seconds:
+            starts.append(t)
+    return starts
+
+
+def aligned_boundaries(renditions, target_seconds):
+    # Start times shared by every rendition's keyframes, so a player can switch
+    # variants between any two segments without skipping or repeating media
+    first, *rest = renditions[0]
+    shared = [first] + [t for t in rest
+                        if all(abs(nearest(keyframes, t) - t) <= ALIGN_TOLERANCE for keyframes in renditions[1:])]
+    return segment_boundaries(shared, target_seconds)
+
+
+def segment_file(source, output_dir, target_seconds=SEGMENT_SECONDS, times=None):
+    # Write init.mp4, seg_NNNNN.m4s and index.m3u8 for one source; returns the peak bitrate.
+    # Given times (from aligned_boundaries), segments start at this source's matching keyframes.
+    with open(source, 'rb') as f:
+        moov, tracks, reference = read_tracks(f)
+        keyframes = keyframe_times(reference)
+        if times is None:
+            times = segment_boundaries(keyframes, target_seconds)
+        else:
+            times = [nearest(keyframes, t) for t in times]
+
+        os.makedirs(output_dir, exist_ok=True)
+        with open(os.path.join(output_dir, INIT_SEGMENT), 'wb') as out:
+            out.write(init_segment(moov, tracks))
+
+        # Every track is cut at the same presentation times as the reference track
+        cuts = []
+        for track in tracks:
+            starts = [bisect_left(track.decode_times, round(t * track.timescale)) for t in times]
+            cuts.append(starts + [len(track.sizes)])
+        end_time = max(track.seconds(len(track.sizes) - 1) + track.durations[-1] / track.timescale for track in tracks)
+        times.append(end_time)
+
+        entries = []
+        peak = 0
+        for n in range(len(times) - 1):
+            runs = [(track, cut[n], cut[n + 1]) for track, cut in zip(tracks, cuts)]
+            name = f'seg_{n:05d}.m4s'
+            segment = media_segment(f, n + 1, runs)
+            with open(os.path.join(output_dir, name), 'wb') as out:
+                out.write(segment)
+            duration = times[n + 1] - times[n]
+            entries.append((name, duration))
+            if duration > 0:
+                peak = max(peak, int(len(segment) * 8 / duration))
+
+    lines = [
+        '#EXTM3U',
+        '#EXT-X-VERSION:7',
+        f'#EXT-X-TARGETDURATION:{max(1, math.ceil(max(duration for _, duration in entries)))}',
+        '#EXT-X-PLAYLIST-TYPE:VOD',
+        '#EXT-X-INDEPENDENT-SEGMENTS',
+        f'#EXT-X-MAP:URI="{INIT_SEGMENT}"',
+    ]
+    for name, duration in entries:
+        lines += [f'#EXTINF:{duration:.3f},', name]
+    lines.append('#EXT-X-ENDLIST')
+    with open(os.path.join(output_dir, RENDITION_PLAYLIST), 'w') as out:
+        out.write('\n'.join(lines) + '\n')
+    return peak
+
+
+def output_dir_for(path, root='.'):
+    # hls/<path without extension>/ for a local video path relative to root
+    return os.path.join(root, HLS_DIR, os.path.splitext(path)[0])
+
+
+def hls_manifest(path, root='.'):
+    # Master playlist path relative to root, if the video has been segmented
+    manifest = os.path.join(HLS_DIR, os.path.splitext(path)[0], MASTER_PLAYLIST)
+    return manifest if os.path.isfile(os.path.join(root, manifest)) else None
+
+
+def hls_player(root='.'):
+    # Vendored hls.js path relative to root, if it has been downloaded
+    return HLS_JS if os.path.isfile(os.path.join(root, HLS_JS)) else None
+
+
+def vendor_player(root='.'):
+    # Download the pinned hls.js once; True if it had to be fetched. Raises
+    # ValueError, keeping nothing, unless the file matches HLS_JS_SHA256.
+    # Imported here: the app imports this module on startup and never downloads
+    from urllib.request import urlopen
+
+    path = os.path.join(root, HLS_JS)
+    if os.path.isfile(path):
+        return False
+    if HLS_JS_SHA256 is None:
+        raise ValueError(f"no checksum recorded for hls.js {HLS_JS_VERSION}")
+    with urlopen(HLS_JS_URL) as response:
+        data = response.read()
+    if hashlib.sha256(data).hexdigest() != HLS_JS_SHA256:
+        raise ValueError(f"{HLS_JS_URL} does not match the recorded checksum")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(data)
+    os.replace(temporary, path)
+    return True
+
+
+def file_checksum(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_state(sources, root, previous, target_seconds):
+    # Size, mtime and checksum per source; the checksum is reused while size and mtime match
+    known = previous.get('sources', {}) if previous.get('version') == SEGMENTER_VERSION else {}
+    state = {}
+    for quality, path in sources.items():
+        stat = os.stat(os.path.join(root, path))
+        entry = {'path': path, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+        old = known.get(quality, {})
+        if all(old.get(key) == value for key, value in entry.items()):
+            entry['sha256'] = old['sha256']
+        else:
+            entry['sha256'] = file_checksum(os.path.join(root, path))
+        state[quality] = entry
+    return {'version': SEGMENTER_VERSION, 'segment_seconds': target_seconds, 'sources': state}
+
+
+def checksums(state):
+    return {quality: source['sha256'] for quality, source in state.get('sources', {}).items()}
+
+
+def segment_video(path, root='.', target_seconds=SEGMENT_SECONDS):
+    # Segment every rendition of a video; False if nothing changed since the last run
+    output = output_dir_for(path, root)
+    state_path = os.path.join(output, STATE_FILE)
+    previous = {}
+    if os.path.isfile(state_path):
+        with open(state_path, 'r') as f:
+            previous = json.load(f)
+
+    sources = rendition_sources(path, root)
+    state = source_state(sources, root, previous, target_seconds)
+    if (previous.get('version') == SEGMENTER_VERSION and previous.get('segment_seconds') == target_seconds
+            and checksums(previous) == checksums(state) and os.path.isfile(os.path.join(output, MASTER_PLAYLIST))):
+        if previous != state:
+            # Touched but identical: remember the new mtimes so the next run skips hashing
+            write_json(state_path, state)
+        return False
+
+    # Build next to the old output and swap it in, so players never see half a rendition
+    staging = output + '.partial'
+    shutil.rmtree(staging, ignore_errors=True)
+    keyframes = [source_keyframes(os.path.join(root, source)) for source in sources.values()]
+    times = aligned_boundaries(keyframes, target_seconds)
+    variants = []
+    for quality, source in sources.items():
+        info = probe(os.path.join(root, source))
+        peak = segment_file(os.path.join(root, source), os.path.join(staging, quality), target_seconds, times)
+        variants.append((quality, info, peak))
+
+    lines = ['#EXTM3U', '#EXT-X-VERSION:7', '#EXT-X-INDEPENDENT-SEGMENTS']
+    for quality, info, peak in sorted(variants, key=lambda variant: variant[2]):
+        attributes = [f'BANDWIDTH={max(peak, info["bitrate"] or 0)}']
+        if info['bitrate']:
+            attributes.append(f'AVERAGE-BANDWIDTH={info["bitrate"]}')
+        if info['height']:
+            attributes.append(f'RESOLUTION={info["width"]}x{info["height"]}')
+        codecs = [codec for codec in (info['video_codec'], info['audio_codec']) if codec]
+        if codecs and all('.' in codec for codec in codecs):
+            attributes.append(f'CODECS="{",".join(codecs)}"')
+        lines += ['#EXT-X-STREAM-INF:' + ','.join(attributes), f'{quality}/{RENDITION_PLAYLIST}']
+    with open(os.path.join(staging, MASTER_PLAYLIST), 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    write_json(os.path.join(staging, STATE_FILE), state)
+
+    shutil.rmtree(output, ignore_errors=True)
+    os.replace(staging, output)
+    return True
+
+
+def segmented_qualities(path, root='.'):
+    # Catalog qualities of the renditions last written for a video
+    with open(os.path.join(output_dir_for(path, root), STATE_FILE), 'r') as f:
+        produced = json.load(f)['sources']
+    return [quality for quality in QUALITIES if quality in produced]
+
+
+def write_json(path, data):
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+
+
+def main():
+    update_quality = '--update-quality' in sys.argv[1:]
+    args = [arg for arg in sys.argv[1:] if arg != '--update-quality']
+    source = args[0] if len(args) > 0 else 'content_database.json'
+    root = args[1] if len(args) > 1 else os.path.dirname(os.path.abspath(source))
+    target_seconds = float(args[2]) if len(args) > 2 else SEGMENT_SECONDS
+
+    with open(source, 'r') as f:
+        content_data = json.load(f)
+
+    start = time.perf_counter()
+    segmented = failed = 0
+    produced = {}
+    for path in local_videos(content_data, root):
+        if os.path.splitext(path)[1].lower() not in ('.mp4', '.m4v', '.mov'):
+            continue
+        try:
+            if segment_video(path, root, target_seconds):
+                segmented += 1
+                print(f"  {path}: segmented into {output_dir_for(path, '')}")
+            else:
+                print(f"  {path}: unchanged")
+            produced[path] = segmented_qualities(path, root)
+        except (OSError, ValueError, struct.error) as e:
+            failed += 1
+            print(f"  {path}: skipped ({e})")
+
+    if produced:
+        try:
+            if vendor_player(root):
+                print(f"  Saved hls.js {HLS_JS_VERSION} to {HLS_JS}")
+        except (OSError, ValueError) as e:
+            print(f"  Could not vendor hls.js {HLS_JS_VERSION} ({e}); "
+                  f"browsers without native HLS will play the original files")
+
+    # On request, add the renditions every one of a title's videos now has to its
+    # quality list; curated qualities are never removed
+    changed = 0
+    for key in ('movies', 'tv_shows') if update_quality else ():
+        for item in content_data.get(key, []):
+            urls = [entry['video_url'] for entry in [item] + item.get('episodes', []) if entry.get('video_url')]
+            paths = [local_video_path(url, root) for url in urls]
+            if not paths or any(path not in produced for path in paths):
+                continue
+            listed = item.get('quality', [])
+            qualities = [quality for quality in QUALITIES
+                         if quality in listed or all(quality in produced[path] for path in paths)]
+            if qualities != [quality for quality in QUALITIES if quality in listed]:
+                item['quality'] = qualities + [quality for quality in listed if quality not in QUALITIES]
+                changed += 1
+
+    if changed:
+        temporary = source + '.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(content_data, f, indent=2)
+            f.write('\n')
+        os.replace(temporary, source)
+    print(f"Segmented {segmented} video(s) in {time.perf_counter() - start:.2f}s, updated {changed} title(s) in {source}"
+          + (f", {failed} failed" if failed else ""))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
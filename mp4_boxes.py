@@ -0,0 +1,127 @@
+# Minimal ISO base media (MP4/MOV) box reader and writer
+import struct
+
+# Boxes whose payload is just more boxes, on the path down to the sample tables and fragments
+CONTAINER_TYPES = {b'moov', b'trak', b'mdia', b'minf', b'stbl', b'mvex', b'moof', b'traf'}
+
+
+class Box:
+    def __init__(self, type, offset, header_size, size):
+        self.type = type
+        self.offset = offset
+        self.header_size = header_size
+        self.size = size
+
+    @property
+    def end(self):
+        return self.offset + self.size
+
+    @property
+    def payload_offset(self):
+        return self.offset + self.header_size
+
+
+def read_header(f, offset, limit):
+    # Box starting at offset, or None at the end of its parent (or a truncated file)
+    f.seek(offset)
+    header = f.read(8)
+    if len(header) < 8 or offset + 8 > limit:
+        return None
+    size, box_type = struct.unpack('>I4s', header)
+    header_size = 8
+    if size == 1:
+        large = f.read(8)
+        if len(large) < 8:
+            return None
+        size = struct.unpack('>Q', large)[0]
+        header_size = 16
+    elif size == 0:
+        # Runs to the end of the enclosing box (in practice, the file)
+        size = limit - offset
+    if size < header_size or offset + size > limit:
+        raise ValueError(f"Corrupt '{box_type.decode('latin-1')}' box at offset {offset}")
+    return Box(box_type, offset, header_size, size)
+
+
+def iter_boxes(f, start, end):
+    offset = start
+    while offset < end:
+        box = read_header(f, offset, end)
+        if box is None:
+            return
+        yield box
+        offset = box.end
+
+
+def top_level_boxes(f):
+    f.seek(0, 2)
+    return list(iter_boxes(f, 0, f.tell()))
+
+
+def find_box(f, parent, path):
+    # First box under parent matching a path like [b'trak', b'mdia', b'mdhd']
+    for box in iter_boxes(f, parent.payload_offset, parent.end):
+        if box.type == path[0]:
+            return box if len(path) == 1 else find_box(f, box, path[1:])
+    return None
+
+
+def read_payload(f, box):
+    f.seek(box.payload_offset)
+    return f.read(box.size - box.header_size)
+
+
+def box_bytes(box_type, payload):
+    size = 8 + len(payload)
+    if size > 0xFFFFFFFF:
+        return struct.pack('>I4sQ', 1, box_type, size + 8) + payload
+    return struct.pack('>I4s', size, box_type) + payload
+
+
+class BoxTree:
+    # A box held in memory: containers as a list of children, everything else as raw payload
+    def __init__(self, type, payload=None, children=None, trailer=b''):
+        self.type = type
+        self.payload = payload
+        self.children = children
+        # Bytes after the last child (old QuickTime writers pad with zeros), kept verbatim
+        self.trailer = trailer
+
+    @classmethod
+    def parse(cls, data, box_type):
+        if box_type not in CONTAINER_TYPES:
+            return cls(box_type, payload=data)
+        children = []
+        offset = 0
+        while offset + 8 <= len(data):
+            size, child_type = struct.unpack_from('>I4s', data, offset)
+            header_size = 8
+            if size == 1:
+                size = struct.unpack_from('>Q', data, offset + 8)[0]
+                header_size = 16
+            elif size == 0:
+                size = len(data) - offset
+            if size < header_size or offset + size > len(data):
+                raise ValueError(f"Corrupt '{child_type.decode('latin-1')}' box inside '{box_type.decode('latin-1')}'")
+            children.append(cls.parse(data[offset + header_size:offset + size], child_type))
+            offset += size
+        return cls(box_type, children=children, trailer=data[offset:])
+
+    def child(self, box_type):
+        return next((child for child in self.children or () if child.type == box_type), None)
+
+    def find(self, path):
+        node = self
+        for box_type in path:
+            node = node.child(box_type) if node is not None else None
+        return node
+
+    def walk(self):
+        yield self
+        for child in self.children or ():
+            yield from child.walk()
+
+    def to_bytes(self):
+        if self.children is None:
+            return box_bytes(self.type, self.payload)
+        return box_bytes(self.type, b''.join(child.to_bytes() for child in self.children) + self.trailer)
@@ -0,0 +1,276 @@
+# Read duration, resolution, codecs and bitrate of local MP4 files from their headers
+# and write them into content_database.json. Media data is never read.
+import json
+import os
+import struct
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from catalog import QUALITIES
+from faststart import local_videos
+from mp4_boxes import find_box, iter_boxes, read_payload, top_level_boxes
+from video_server import local_video_path
+
+# Minimum picture height for each entry in catalog.QUALITIES
+QUALITY_HEIGHTS = [720, 2160, 4320]
+
+# Sample entry fields before the codec configuration boxes (ISO/IEC 14496-12 8.5.2)
+VISUAL_ENTRY_SIZE = 78
+AUDIO_ENTRY_SIZE = 28
+
+PROBE_WORKERS = 16
+
+
+def full_box_times(payload):
+    # (timescale, duration) from an mvhd or mdhd payload, either version
+    if payload[0] == 1:
+        timescale, duration = struct.unpack_from('>IQ', payload, 20)
+        unknown = 0xFFFFFFFFFFFFFFFF
+    else:
+        timescale, duration = struct.unpack_from('>II', payload, 12)
+        unknown = 0xFFFFFFFF
+    return timescale, None if duration == unknown else duration
+
+
+def descriptor(data, offset):
+    # (tag, payload start, payload end) of an MPEG-4 descriptor in an esds box
+    tag = data[offset]
+    offset += 1
+    length = 0
+    for _ in range(4):
+        byte = data[offset]
+        offset += 1
+        length = (length << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            break
+    return tag, offset, offset + length
+
+
+def audio_codec(esds):
+    # RFC 6381 codec string such as "mp4a.40.2" from an esds payload
+    tag, start, end = descriptor(esds, 4)
+    if tag != 3:
+        return 'mp4a'
+    flags = esds[start + 2]
+    offset = start + 3
+    if flags & 0x80:
+        offset += 2
+    if flags & 0x40:
+        offset += 1 + esds[offset]
+    if flags & 0x20:
+        offset += 2
+    tag, start, end = descriptor(esds, offset)
+    if tag != 4:
+        return 'mp4a'
+    object_type = esds[start]
+    if start + 13 < end:
+        tag, info, _ = descriptor(esds, start + 13)
+        if tag == 5:
+            return f'mp4a.{object_type:02x}.{esds[info] >> 3}'
+    return f'mp4a.{object_type:02x}'
+
+
+def sample_entry(f, stbl):
+    # (codec string, coded width, coded height) of a track's first sample description
+    stsd = find_box(f, stbl, [b'stsd'])
+    if stsd is None:
+        return None, 0, 0
+    entry = next(iter_boxes(f, stsd.payload_offset + 8, stsd.end), None)
+    if entry is None:
+        return None, 0, 0
+    fourcc = entry.type.decode('latin-1')
+    f.seek(entry.payload_offset)
+    if entry.type in (b'avc1', b'avc3', b'hvc1', b'hev1', b'av01', b'vp09', b'mp4v'):
+        fields = f.read(VISUAL_ENTRY_SIZE)
+        width, height = struct.unpack_from('>HH', fields, 24)
+        config = next((box for box in iter_boxes(f, entry.payload_offset + VISUAL_ENTRY_SIZE, entry.end)
+                       if box.type == b'avcC'), None)
+        if config is not None:
+            profile = read_payload(f, config)[1:4]
+            fourcc += '.' + profile.hex()
+        return fourcc, width, height
+    if entry.type == b'mp4a':
+        esds = next((box for box in iter_boxes(f, entry.payload_offset + AUDIO_ENTRY_SIZE, entry.end)
+                     if box.type == b'esds'), None)
+        if esds is not None:
+            try:
+                fourcc = audio_codec(read_payload(f, esds))
+            except IndexError:
+                pass
+    return fourcc, 0, 0
+
+
+def probe(path):
+    # Media facts for an MP4/MOV file; raises ValueError if it has no readable moov
+    with open(path, 'rb') as f:
+        boxes = top_level_boxes(f)
+        moov = next((box for box in boxes if box.type == b'moov'), None)
+        if moov is None:
+            raise ValueError("No 'moov' box")
+        ftyp = next((box for box in boxes if box.type == b'ftyp'), None)
+        info = {
+            'brand': read_payload(f, ftyp)[:4].decode('latin-1').strip() if ftyp else None,
+            'duration': None,
+            'width': 0,
+            'height': 0,
+            'video_codec': None,
+            'audio_codec': None,
+            'bitrate': None,
+            'faststart': moov.offset < min((box.offset for box in boxes if box.type == b'mdat'), default=moov.end),
+        }
+
+        mvhd = find_box(f, moov, [b'mvhd'])
+        if mvhd is not None:
+            timescale, duration = full_box_times(read_payload(f, mvhd))
+            if timescale and duration is not None:
+                info['duration'] = duration / timescale
+
+        for trak in iter_boxes(f, moov.payload_offset, moov.end):
+            if trak.type != b'trak':
+                continue
+            hdlr = find_box(f, trak, [b'mdia', b'hdlr'])
+            stbl = find_box(f, trak, [b'mdia', b'minf', b'stbl'])
+            if hdlr is None or stbl is None:
+                continue
+            handler = read_payload(f, hdlr)[8:12]
+            if info['duration'] is None:
+                mdhd = find_box(f, trak, [b'mdia', b'mdhd'])
+                timescale, duration = full_box_times(read_payload(f, mdhd)) if mdhd else (0, None)
+                if timescale and duration is not None:
+                    info['duration'] = duration / timescale
+            if handler == b'vide' and info['video_codec'] is None:
+                info['video_codec'], width, height = sample_entry(f, stbl)
+                tkhd = find_box(f, trak, [b'tkhd'])
+                if tkhd is not None:
+                    payload = read_payload(f, tkhd)
+                    # Display size as 16.16 fixed point, after any pixel aspect correction
+                    display = struct.unpack_from('>II', payload, len(payload) - 8)
+                    width, height = (display[0] >> 16) or width, (display[1] >> 16) or height
+                info['width'], info['height'] = width, height
+            elif handler == b'soun' and info['audio_codec'] is None:
+                info['audio_codec'] = sample_entry(f, stbl)[0]
+
+    media_bytes = sum(box.size - box.header_size for box in boxes if box.type == b'mdat')
+    if info['duration']:
+        info['bitrate'] = int(media_bytes * 8 / info['duration'])
+    return info
+
+
+def format_duration(seconds):
+    # Same style as the hand-written catalog values: "2h 15m", "45m"
+    minutes = int(round(seconds / 60))
+    if minutes == 0:
+        return f"{int(round(seconds))}s"
+    if minutes < 60:
+        return f"{minutes}m"
+    return f"{minutes // 60}h {minutes % 60}m"
+
+
+def qualities_for(height):
+    return [quality for quality, minimum in zip(QUALITIES, QUALITY_HEIGHTS) if height >= minimum]
+
+
+def rendition_sources(path, root='.', info=None):
+    # {quality: path} for a video and its siblings named like "movie.4K.mp4"
+    stem, extension = os.path.splitext(path)
+    sources = {}
+    for quality in QUALITIES:
+        sibling = f'{stem}.{quality}{extension}'
+        if os.path.isfile(os.path.join(root, sibling)):
+            sources[quality] = sibling
+    # The file the catalog points at is labelled by its own resolution
+    own = qualities_for((info or probe(os.path.join(root, path)))['height'])
+    sources[own[-1] if own else 'SD'] = path
+    return sources
+
+
+def title_qualities(paths, root='.', infos=None, listed=()):
+    # Qualities every one of a title's local videos (its movie file or all of its
+    # episodes) can be played in: each video's renditions, and anything below the
+    # resolution of its own file. A video without sibling encodes keeps the listed
+    # qualities from its own resolution up, as they may be served from elsewhere.
+    offered = set(QUALITIES)
+    for path, info in zip(paths, infos or [None] * len(paths)):
+        info = info or probe(os.path.join(root, path))
+        sources = rendition_sources(path, root, info)
+        own = qualities_for(info['height'])
+        available = set(sources) | set(own)
+        if len(sources) == 1:
+            floor = max(len(own) - 1, 0)
+            available |= {quality for quality in listed if quality in QUALITIES[floor:]}
+        offered &= available
+    return [quality for quality in QUALITIES if quality in offered]
+
+
+def apply_probe(item, info):
+    # Overwrite an item's hand-typed media fields with probed ones; True if anything changed
+    before = dict(item)
+    if info['duration']:
+        item['duration'] = format_duration(info['duration'])
+        item['duration_seconds'] = round(info['duration'], 3)
+    if info['height']:
+        item['resolution'] = f"{info['width']}x{info['height']}"
+    for key in ('video_codec', 'audio_codec', 'bitrate'):
+        if info[key]:
+            item[key] = info[key]
+    return item != before
+
+
+def main():
+    source = sys.argv[1] if len(sys.argv) > 1 else 'content_database.json'
+    root = sys.argv[2] if len(sys.argv) > 2 else os.path.dirname(os.path.abspath(source))
+
+    with open(source, 'r') as f:
+        content_data = json.load(f)
+
+    start = time.perf_counter()
+    paths = local_videos(content_data, root)
+
+    def probe_path(path):
+        try:
+            return path, probe(os.path.join(root, path))
+        except (OSError, ValueError, struct.error) as e:
+            return path, e
+
+    # Each probe is a handful of small reads, so threads overlap the disk latency
+    results = {}
+    with ThreadPoolExecutor(PROBE_WORKERS) as pool:
+        for path, info in pool.map(probe_path, paths):
+            if isinstance(info, Exception):
+                print(f"  {path}: skipped ({info})")
+                continue
+            results[path] = info
+            print(f"  {path}: {format_duration(info['duration'] or 0)}, {info['width']}x{info['height']}, "
+                  f"{info['video_codec']}/{info['audio_codec']}, {(info['bitrate'] or 0) / 1000:.0f} kb/s")
+
+    changed = 0
+    for key in ('movies', 'tv_shows'):
+        for item in content_data.get(key, []):
+            playable = [entry for entry in [item] + item.get('episodes', []) if entry.get('video_url')]
+            title_paths = [local_video_path(entry['video_url'], root) for entry in playable]
+            probed = [results.get(path) for path in title_paths]
+            updated = False
+            for entry, info in zip(playable, probed):
+                if info is not None:
+                    updated |= apply_probe(entry, info)
+            # A title can only offer the qualities all of its files reach
+            if playable and None not in probed:
+                qualities = title_qualities(title_paths, root, probed, item.get('quality', []))
+                if qualities and item.get('quality') != qualities:
+                    item['quality'] = qualities
+                    updated = True
+            changed += updated
+
+    if changed:
+        temporary = source + '.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(content_data, f, indent=2)
+            f.write('\n')
+        os.replace(temporary, source)
+    print(f"Probed {len(results)} of {len(paths)} video(s) in {time.perf_counter() - start:.2f}s, "
+          f"updated {changed} title(s) in {source}")
+
+
+if __name__ == "__main__":
+    main()
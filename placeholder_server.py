@@ -0,0 +1,83 @@
+# Offline stand-in for via.placeholder.com: answers "/300x450/667eea/white?text=..."
+# with a solid PNG of that size and background colour. Point the thumbnail proxy at
+# it (STREAMFLIX_THUMBNAIL_UPSTREAM) to run or test without network access.
+import re
+import struct
+import sys
+import threading
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+PATH_PATTERN = re.compile(r'/(\d+)(?:x(\d+))?(?:/([0-9a-zA-Z]+))?')
+NAMED_COLOURS = {'white': 'ffffff', 'black': '000000', 'gray': 'cccccc', 'grey': 'cccccc'}
+MAX_SIDE = 2000
+
+
+def parse_colour(value, default='cccccc'):
+    value = NAMED_COLOURS.get((value or '').lower(), value or default)
+    if len(value) == 3:
+        value = ''.join(c * 2 for c in value)
+    try:
+        return bytes.fromhex(value) if len(value) == 6 else bytes.fromhex(default)
+    except ValueError:
+        return bytes.fromhex(default)
+
+
+def solid_png(width, height, rgb):
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    row = b'\x00' + rgb * width
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(row * height, 9))
+            + chunk(b'IEND', b''))
+
+
+class PlaceholderRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        match = PATH_PATTERN.match(urlparse(self.path).path)
+        if match is None:
+            self.send_error(404)
+            return
+        width = min(int(match.group(1)), MAX_SIDE)
+        height = min(int(match.group(2) or width), MAX_SIDE)
+        body = solid_png(max(width, 1), max(height, 1), parse_colour(match.group(3)))
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/png')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class PlaceholderServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address):
+        super().__init__(address, PlaceholderRequestHandler)
+
+
+def start_placeholder_server(port, host='localhost'):
+    server = PlaceholderServer((host, port))
+    threading.Thread(target=server.serve_forever, name='placeholder-server', daemon=True).start()
+    return server
+
+
+def main():
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8504
+    server = PlaceholderServer(('localhost', port))
+    print(f"Serving placeholder images at http://localhost:{port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# Warm the shared chunk cache with the start of the video a viewer is about to play
+# next, so switching to it is served from memory instead of a cold disk read. The
+# player asks for it through the video server once playback nears the end.
+import os
+import threading
+
+from adaptive import eligible_variants, media_playlist, parse_master_playlist
+from chunk_cache import file_key
+from hls_segmenter import hls_manifest
+from mp4_boxes import top_level_boxes
+
+# How long before the end of the current video (by playback position) the next one is warmed
+PREFETCH_LEAD = 30
+# Leading segments per rendition of a segmented video
+PREFETCH_SEGMENTS = 2
+# Head of a progressive file (its moov is warmed too, wherever it is)
+PREFETCH_BYTES = 4 << 20
+
+def prefetch_ranges(path, root='.', allowed=None):
+    # (file, first byte, last byte) the player will request first for a local video,
+    # limited to the renditions it may play
+    manifest = hls_manifest(path, root)
+    if manifest is None:
+        source = os.path.join(root, path)
+        with open(source, 'rb') as f:
+            boxes = top_level_boxes(f)
+        ranges = [(source, 0, PREFETCH_BYTES - 1)]
+        ranges += [(source, box.offset, box.end - 1) for box in boxes if box.type == b'moov']
+        return ranges
+
+    folder = os.path.join(root, os.path.dirname(manifest))
+    master = os.path.join(root, manifest)
+    ranges = [(master, 0, os.path.getsize(master) - 1)]
+    with open(master, 'r') as f:
+        variants = parse_master_playlist(f.read())
+    if allowed is not None:
+        variants = eligible_variants(variants, allowed)
+    for variant in variants:
+        playlist = os.path.join(folder, variant['uri'])
+        with open(playlist, 'r') as f:
+            init, segments = media_playlist(f.read())
+        names = [init] + [uri for uri, _ in segments[:PREFETCH_SEGMENTS]]
+        for name in [variant['uri']] + [os.path.join(os.path.dirname(variant['uri']), name) for name in names]:
+            file = os.path.join(folder, name)
+            ranges.append((file, 0, os.path.getsize(file) - 1))
+    return ranges
+
+
+class Prefetcher:
+    def __init__(self, chunk_cache, root='.'):
+        self.chunk_cache = chunk_cache
+        self.root = root
+        self.pending = set()
+        self.lock = threading.Lock()
+
+    def schedule(self, path, allowed=None):
+        # Warm path in the background; a path already being warmed is not queued again
+        with self.lock:
+            if path in self.pending:
+                return
+            self.pending.add(path)
+        threading.Thread(target=self.run, args=(path, allowed), name='prefetch', daemon=True).start()
+
+    def run(self, path, allowed=None):
+        try:
+            self.warm(path, allowed)
+        except (OSError, ValueError):
+            # The file changed or went away; the player will fetch it cold
+            pass
+        finally:
+            with self.lock:
+                self.pending.discard(path)
+
+    def warm(self, path, allowed=None):
+        for source, start, end in prefetch_ranges(path, self.root, allowed):
+            # Same key the video server uses, so its requests hit these chunks
+            source = os.path.realpath(source)
+            with open(source, 'rb') as f:
+                stat = os.fstat(f.fileno())
+                if stat.st_size:
+                    self.chunk_cache.warm(f, file_key(source, stat), start, min(end, stat.st_size - 1))
@@ -0,0 +1,77 @@
+# Startup report for streamflix_pro.py: per-module import time and first-render time.
+# Both are measured in fresh interpreters, so the numbers reflect a cold process start.
+import json
+import os
+import subprocess
+import sys
+
+# Dependencies that should only load on the pages that use them
+HEAVY_MODULES = ['pandas', 'matplotlib', 'requests']
+
+RENDER_SCRIPT = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file(sys.argv[1], default_timeout=300)
+start = time.perf_counter()
+app.run()
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    'seconds': elapsed,
+    'errors': [str(e.value) for e in app.exception],
+    'loaded': [name for name in sys.argv[2:] if name in sys.modules],
+}))
+"""
+
+
+def import_times(module, cwd):
+    # Direct imports of `module` as (name, cumulative microseconds), plus its own total
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=cwd, capture_output=True, text=True)
+    children, total = [], None
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 0 and name.strip() == module:
+            total = int(cumulative)
+            break
+        if depth == 0:
+            # A sibling imported before the app (e.g. by site); not part of the report
+            children = []
+        elif depth == 1:
+            children.append((name.strip(), int(cumulative)))
+    return children, total
+
+
+def first_render(path):
+    result = subprocess.run([sys.executable, '-c', RENDER_SCRIPT, path] + HEAVY_MODULES,
+                            cwd=os.path.dirname(path), capture_output=True, text=True)
+    lines = result.stdout.strip().splitlines()
+    if result.returncode != 0 or not lines:
+        raise RuntimeError(result.stderr.strip() or "App did not render")
+    return json.loads(lines[-1])
+
+
+def main():
+    path = os.path.abspath(sys.argv[1] if len(sys.argv) > 1 else 'streamflix_pro.py')
+    module = os.path.splitext(os.path.basename(path))[0]
+
+    children, total = import_times(module, os.path.dirname(path))
+    if total is None:
+        print(f"Could not import {module}")
+        sys.exit(1)
+    print(f"Import time for {module} (cumulative, slowest first):")
+    for name, micros in sorted(children, key=lambda child: -child[1]):
+        print(f"  {name:<30} {micros / 1000:8.1f} ms")
+    print(f"  {'total':<30} {total / 1000:8.1f} ms")
+
+    render = first_render(path)
+    print(f"First render (default page): {render['seconds'] * 1000:.1f} ms")
+    for error in render['errors']:
+        print(f"  error: {error}")
+    print(f"Heavy modules loaded by first render: {', '.join(render['loaded']) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+# Inverted-index full-text and trigram fuzzy search for StreamFlix Pro
+import math
+import re
+from bisect import bisect_left
+from collections import Counter
+
+# Searchable fields and their weights in the final match score
+SEARCH_FIELDS = [
+    ('title', 0.4),
+    ('description', 0.2),
+    ('genre', 0.2),
+    ('cast', 0.15),
+    ('director', 0.1),
+]
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Upper bound on vocabulary terms a trailing query prefix may expand to
+MAX_PREFIX_EXPANSION = 32
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def field_text(content, field):
+    value = content.get(field, '')
+    if isinstance(value, list):
+        return ' '.join(value)
+    return value
+
+
+class SearchIndex:
+    def __init__(self, catalog=None):
+        # field -> term -> {row: term frequency}
+        self.postings = {field: {} for field, _ in SEARCH_FIELDS}
+        # field -> {row: token count}
+        self.lengths = {field: {} for field, _ in SEARCH_FIELDS}
+        self.total_lengths = {field: 0 for field, _ in SEARCH_FIELDS}
+        # term -> number of documents containing it in any field
+        self.doc_freq = Counter()
+        self.doc_count = 0
+        self._vocabulary = None
+        # Typo-tolerant matching over titles and people
+        self.fuzzy = TrigramIndex()
+
+        if catalog is not None:
+            for row in catalog.rows():
+                self.add(row, catalog.record(row))
+
+    def _document_terms(self, content):
+        return {field: Counter(tokenize(field_text(content, field))) for field, _ in SEARCH_FIELDS}
+
+    def add(self, row, content):
+        terms = self._document_terms(content)
+        for field, counts in terms.items():
+            postings = self.postings[field]
+            for term, tf in counts.items():
+                postings.setdefault(term, {})[row] = tf
+            length = sum(counts.values())
+            self.lengths[field][row] = length
+            self.total_lengths[field] += length
+        self.doc_freq.update(set().union(*terms.values()))
+        self.doc_count += 1
+        self._vocabulary = None
+        self.fuzzy.add(row, content)
+
+    def remove(self, row, content):
+        terms = self._document_terms(content)
+        for field, counts in terms.items():
+            postings = self.postings[field]
+            for term in counts:
+                rows = postings.get(term)
+                if rows is not None:
+                    rows.pop(row, None)
+                    if not rows:
+                        del postings[term]
+            self.total_lengths[field] -= self.lengths[field].pop(row, 0)
+        for term in set().union(*terms.values()):
+            self.doc_freq[term] -= 1
+            if self.doc_freq[term] <= 0:
+                del self.doc_freq[term]
+        self.doc_count -= 1
+        self._vocabulary = None
+        self.fuzzy.remove(row)
+
+    def vocabulary(self):
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self.doc_freq)
+        return self._vocabulary
+
+    def expand_prefix(self, prefix):
+        vocabulary = self.vocabulary()
+        start = bisect_left(vocabulary, prefix)
+        expanded = []
+        for term in vocabulary[start:start + MAX_PREFIX_EXPANSION]:
+            if not term.startswith(prefix):
+                break
+            expanded.append(term)
+        return expanded
+
+    def idf(self, term):
+        df = self.doc_freq.get(term, 0)
+        return math.log(1 + (self.doc_count - df + 0.5) / (df + 0.5))
+
+    def query_terms(self, query):
+        tokens = tokenize(query)
+        if not tokens:
+            return [], []
+        terms = [token for token in dict.fromkeys(tokens[:-1]) if token in self.doc_freq]
+        # The last token may still be being typed, so it also matches as a prefix
+        prefix_terms = [term for term in self.expand_prefix(tokens[-1]) if term not in terms]
+        return terms, prefix_terms
+
+    def search(self, query, allowed=None, fuzzy=True):
+        scores = self.match(query, allowed)
+        if fuzzy:
+            # A near-miss on a title or name scores like a partial match there
+            for row, score in self.fuzzy.search(query, allowed):
+                if score > scores.get(row, 0.0):
+                    scores[row] = score
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+    def match(self, query, allowed=None):
+        terms, prefix_terms = self.query_terms(query)
+        if not terms and not prefix_terms:
+            return {}
+
+        idfs = {term: self.idf(term) for term in terms + prefix_terms}
+        # Normalise so every field contributes at most its weight, keeping
+        # scores on the same 0-100% scale as the original substring match.
+        # Prefix expansions share a single query slot.
+        norm = sum(idfs[term] for term in terms)
+        if prefix_terms:
+            norm += max(idfs[term] for term in prefix_terms)
+        if norm <= 0:
+            return {}
+
+        scores = {}
+        for field, weight in SEARCH_FIELDS:
+            postings = self.postings[field]
+            lengths = self.lengths[field]
+            avg_length = self.total_lengths[field] / self.doc_count if self.doc_count else 0
+            for term, idf in idfs.items():
+                rows = postings.get(term)
+                if not rows:
+                    continue
+                for row, tf in rows.items():
+                    if allowed is not None and not allowed(row):
+                        continue
+                    length_ratio = lengths[row] / avg_length if avg_length else 1.0
+                    # One occurrence in an average-length field counts as a full match
+                    saturation = min(1.0, tf * (K1 + 1) / (tf + K1 * (1 - B + B * length_ratio)))
+                    scores[row] = scores.get(row, 0.0) + weight * idf * saturation / norm
+
+        return scores
+
+
+# Fields matched fuzzily by character trigrams, with the same weights as above
+FUZZY_FIELDS = [
+    ('title', 0.4),
+    ('cast', 0.15),
+    ('director', 0.1),
+]
+
+# Minimum trigram similarity for a fuzzy match
+FUZZY_THRESHOLD = 0.3
+
+
+def trigrams(text):
+    grams = set()
+    for word in tokenize(text):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+
+class TrigramIndex:
+    def __init__(self, catalog=None):
+        # entry id -> (row, weight, trigram set)
+        self.entries = {}
+        # trigram -> set of entry ids
+        self.postings = {}
+        # row -> entry ids, so a record can be removed again
+        self.row_entries = {}
+        self._next_entry = 0
+
+        if catalog is not None:
+            for row in catalog.rows():
+                self.add(row, catalog.record(row))
+
+    def _field_values(self, content):
+        for field, weight in FUZZY_FIELDS:
+            value = content.get(field)
+            if not value:
+                continue
+            for text in (value if isinstance(value, list) else [value]):
+                yield text, weight
+
+    def add(self, row, content):
+        entry_ids = []
+        for text, weight in self._field_values(content):
+            grams = trigrams(text)
+            if not grams:
+                continue
+            entry_id = self._next_entry
+            self._next_entry += 1
+            self.entries[entry_id] = (row, weight, grams)
+            for gram in grams:
+                self.postings.setdefault(gram, set()).add(entry_id)
+            entry_ids.append(entry_id)
+        self.row_entries[row] = entry_ids
+
+    def remove(self, row, content=None):
+        for entry_id in self.row_entries.pop(row, []):
+            _, _, grams = self.entries.pop(entry_id)
+            for gram in grams:
+                entry_ids = self.postings.get(gram)
+                if entry_ids is not None:
+                    entry_ids.discard(entry_id)
+                    if not entry_ids:
+                        del self.postings[gram]
+
+    def search(self, query, allowed=None, threshold=FUZZY_THRESHOLD):
+        query_grams = trigrams(query)
+        if not query_grams:
+            return []
+
+        # Any entry with similarity >= threshold shares at least
+        # ceil(threshold * |q|) trigrams with the query, so it must contain
+        # one of the |q| - that + 1 rarest query trigrams.
+        min_shared = max(1, math.ceil(threshold * len(query_grams)))
+        rarest = sorted(query_grams, key=lambda gram: len(self.postings.get(gram, ())))
+        candidates = set()
+        for gram in rarest[:len(query_grams) - min_shared + 1]:
+            candidates.update(self.postings.get(gram, ()))
+
+        scores = {}
+        for entry_id in candidates:
+            row, weight, grams = self.entries[entry_id]
+            if allowed is not None and not allowed(row):
+                continue
+            shared = len(query_grams & grams)
+            similarity = shared / (len(query_grams) + len(grams) - shared)
+            if similarity < threshold:
+                continue
+            score = weight * similarity
+            if score > scores.get(row, 0.0):
+                scores[row] = score
+
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
@@ -1,10 +1,23 @@
 import streamlit as st
+import streamlit.components.v1 as components
 import json
-import pandas as pd
+import os
 from datetime import datetime
-import requests
-from urllib.parse import urlparse
-import matplotlib.pyplot as plt
+from urllib.parse import urlencode
+from catalog import LANGUAGES, QUALITIES, Catalog
+from catalog_watcher import CatalogWatcher, file_signature
+from chart_cache import ChartCache
+from chunk_cache import ChunkCache
+from catalog_snapshot import load_snapshot, snapshot_source
+from catalog_stream import stream_catalog
+from adaptive import FAST_HALF_LIFE, SAFETY_FACTOR, SLOW_HALF_LIFE, allowed_qualities, bandwidth_cap
+from catalog_store import CatalogStore
+from hls_segmenter import HLS_JS, hls_manifest, hls_player
+from prefetch import PREFETCH_LEAD, Prefetcher
+from search_index import SearchIndex
+from thumbnail_proxy import DiskCache, ThumbnailProxy, start_thumbnail_server, thumbnail_url_for
+from trending import TrendingEngine
+from video_server import PREFETCH_PATH, local_video_path, start_video_server, video_url_for
 
 # Set page configuration
 st.set_page_config(
@@ -113,11 +126,36 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+CONTENT_DATABASE = 'content_database.json'
+# Binary snapshot written by compile_catalog.py
+CONTENT_SNAPSHOT = 'content_database.bin'
+# Databases above this size are streamed record by record instead of json.load-ed
+STREAMING_THRESHOLD = 64 * 1024 * 1024
+# Listing backend: "memory" (per-process catalog) or "sqlite" (one on-disk store
+# shared by every worker process; only Search still loads the per-process catalog)
+CATALOG_BACKEND = os.environ.get('STREAMFLIX_CATALOG_BACKEND', 'memory')
+CATALOG_STORE = os.environ.get('STREAMFLIX_CATALOG_STORE', 'content_database.sqlite')
+# Local video files are streamed by a byte-range server next to the app
+VIDEO_SERVER_HOST = os.environ.get('STREAMFLIX_VIDEO_HOST', 'localhost')
+VIDEO_SERVER_PORT = int(os.environ.get('STREAMFLIX_VIDEO_PORT', '8502'))
+VIDEO_SERVER_URL = os.environ.get('STREAMFLIX_VIDEO_URL', f'http://localhost:{VIDEO_SERVER_PORT}')
+# Memory for video chunks shared by all viewers; 0 sends straight from disk
+VIDEO_CACHE_MB = int(os.environ.get('STREAMFLIX_VIDEO_CACHE_MB', '256'))
+# Poster images are fetched once and served from a local disk cache
+THUMBNAIL_HOST = os.environ.get('STREAMFLIX_THUMBNAIL_HOST', 'localhost')
+THUMBNAIL_PORT = int(os.environ.get('STREAMFLIX_THUMBNAIL_PORT', '8503'))
+THUMBNAIL_URL = os.environ.get('STREAMFLIX_THUMBNAIL_URL', f'http://localhost:{THUMBNAIL_PORT}')
+THUMBNAIL_CACHE_DIR = os.environ.get('STREAMFLIX_THUMBNAIL_CACHE', '.thumbnail_cache')
+THUMBNAIL_CACHE_MB = int(os.environ.get('STREAMFLIX_THUMBNAIL_CACHE_MB', '64'))
+# Fetch posters from here instead of their own host, e.g. placeholder_server.py when offline
+THUMBNAIL_UPSTREAM = os.environ.get('STREAMFLIX_THUMBNAIL_UPSTREAM')
+# Cards per page on the Movies, TV Shows and Trending grids
+PAGE_SIZE = 12
+
 # Enhanced content database with more features
-@st.cache_data
 def load_content():
     try:
-        with open('content_database.json', 'r') as f:
+        with open(CONTENT_DATABASE, 'r') as f:
             return json.load(f)
     except FileNotFoundError:
         # Create sample data if file doesn't exist
@@ -250,11 +288,193 @@ def load_content():
         }
 
         # Save to file for future use
-        with open('content_database.json', 'w') as f:
+        with open(CONTENT_DATABASE, 'w') as f:
             json.dump(sample_data, f, indent=2)
 
         return sample_data
 
+# Columnar view of the content database, shared by every session and
+# republished as a patched copy when content_database.json changes
+@st.cache_resource
+def load_catalog_watcher():
+    signature = file_signature(CONTENT_DATABASE)
+
+    # Memory-map the compiled snapshot when it is up to date with the JSON file
+    try:
+        if signature is not None and snapshot_source(CONTENT_SNAPSHOT) == signature:
+            return CatalogWatcher(CONTENT_DATABASE, load_snapshot(CONTENT_SNAPSHOT), signature)
+    except (FileNotFoundError, ValueError):
+        pass
+
+    if signature is not None and os.path.getsize(CONTENT_DATABASE) > STREAMING_THRESHOLD:
+        return CatalogWatcher(CONTENT_DATABASE, stream_catalog(CONTENT_DATABASE), signature)
+
+    return CatalogWatcher(CONTENT_DATABASE, Catalog(load_content()), signature)
+
+def load_catalog():
+    watcher = load_catalog_watcher()
+    watcher.poll()
+    return watcher.catalog
+
+@st.cache_resource
+def load_catalog_store_resource():
+    return CatalogStore(CATALOG_STORE, CONTENT_DATABASE)
+
+def load_catalog_store():
+    store = load_catalog_store_resource()
+    store.sync()
+    return store
+
+# Source for every page but Search, and for view events
+def load_listing():
+    if CATALOG_BACKEND == 'sqlite':
+        return load_catalog_store()
+    return load_catalog()
+
+# Full-text index over the catalog, kept in step with catalog edits
+@st.cache_resource
+def load_search_index():
+    return load_catalog_watcher().attach(SearchIndex)
+
+# Rendered analytics charts, shared by every session
+@st.cache_resource
+def load_chart_cache():
+    return ChartCache()
+
+# Chunk cache in front of local video reads, one per process
+@st.cache_resource
+def load_chunk_cache():
+    return ChunkCache(VIDEO_CACHE_MB << 20) if VIDEO_CACHE_MB else None
+
+# Byte-range video server, one per process
+@st.cache_resource
+def load_video_server():
+    try:
+        return start_video_server('.', VIDEO_SERVER_PORT, VIDEO_SERVER_HOST, load_chunk_cache(), [HLS_JS],
+                                  load_prefetcher())
+    except OSError:
+        # Port already taken, e.g. by another app worker serving the same files
+        return None
+
+def video_source(video_url):
+    # Local files play from the video server instead of being loaded whole by st.video
+    path = local_video_path(video_url)
+    if path is None:
+        return video_url
+    load_video_server()
+    return video_url_for(VIDEO_SERVER_URL, path)
+
+# Segmented videos stream through hls.js (or natively in Safari) from the video server,
+# which also serves the copy of hls.js that hls_segmenter.py vendors; without it other
+# browsers play the original file. hls.js switches renditions on the same throughput
+# averages as adaptive.py, below the bandwidth of the best rendition the title and
+# quality preference allow. With a video queued up next, the player asks the video
+# server to warm it once playback is PREFETCH_LEAD seconds from the end.
+VIDEO_PLAYER = """
+<video id="player" controls playsinline style="width: 100%; max-height: 480px; background: #000;"></video>
+__HLS_SCRIPT__
+<script>
+    const video = document.getElementById('player');
+    const manifest = __MANIFEST__;
+    let prefetch = __PREFETCH__;
+    if (prefetch !== null) {
+        // Follows the playback position, so pausing, seeking and late starts are accounted for
+        video.addEventListener('timeupdate', function () {
+            if (prefetch !== null && video.duration - video.currentTime <= __PREFETCH_LEAD__) {
+                fetch(prefetch, {mode: 'no-cors'});
+                prefetch = null;
+            }
+        });
+    }
+    if (manifest === null) {
+        video.src = __FALLBACK__;
+    } else if (video.canPlayType('application/vnd.apple.mpegurl')) {
+        video.src = manifest;
+    } else if (window.Hls && Hls.isSupported()) {
+        const hls = new Hls({
+            abrEwmaFastVoD: __FAST_HALF_LIFE__,
+            abrEwmaSlowVoD: __SLOW_HALF_LIFE__,
+            abrBandWidthFactor: __SAFETY_FACTOR__,
+            abrBandWidthUpFactor: __SAFETY_FACTOR__,
+        });
+        const cap = __BANDWIDTH_CAP__;
+        hls.on(Hls.Events.MANIFEST_PARSED, function (event, data) {
+            if (cap === null) return;
+            // Levels are sorted by bitrate; never switch above the cap
+            let top = 0;
+            data.levels.forEach(function (level, i) { if (level.bitrate <= cap) top = i; });
+            hls.autoLevelCapping = top;
+        });
+        hls.loadSource(manifest);
+        hls.attachMedia(video);
+    } else {
+        video.src = __FALLBACK__;
+    }
+</script>
+"""
+
+def prefetch_url(video_url, allowed):
+    # Video server request that warms a local video's start into its chunk cache
+    path = local_video_path(video_url)
+    if path is None or not VIDEO_CACHE_MB:
+        return None
+    query = urlencode({'path': path, 'allowed': ','.join(allowed)})
+    return VIDEO_SERVER_URL.rstrip('/') + PREFETCH_PATH + '?' + query
+
+def play_video(video_url, allowed, upcoming_url=None):
+    # upcoming_url: the video autoplay moves on to, warmed shortly before this one ends
+    path = local_video_path(video_url)
+    manifest = hls_manifest(path) if path is not None else None
+    prefetch = prefetch_url(upcoming_url, allowed) if path is not None and upcoming_url else None
+    if manifest is None and prefetch is None:
+        st.video(video_source(video_url), start_time=0)
+        return
+    load_video_server()
+    values = {
+        '__MANIFEST__': video_url_for(VIDEO_SERVER_URL, manifest) if manifest else None,
+        '__FALLBACK__': video_url_for(VIDEO_SERVER_URL, path),
+        '__FAST_HALF_LIFE__': FAST_HALF_LIFE,
+        '__SLOW_HALF_LIFE__': SLOW_HALF_LIFE,
+        '__SAFETY_FACTOR__': SAFETY_FACTOR,
+        '__BANDWIDTH_CAP__': bandwidth_cap(manifest, allowed) if manifest else None,
+        '__PREFETCH__': prefetch,
+        '__PREFETCH_LEAD__': PREFETCH_LEAD,
+    }
+    # No script tag at all without a vendored player (or a playlist), so nothing is requested
+    player = hls_player() if manifest else None
+    script = f'<script src={json.dumps(video_url_for(VIDEO_SERVER_URL, player))}></script>' if player else ''
+    html = VIDEO_PLAYER.replace('__HLS_SCRIPT__', script)
+    for placeholder, value in values.items():
+        html = html.replace(placeholder, json.dumps(value))
+    components.html(html, height=500)
+
+# Thumbnail proxy, one per process
+@st.cache_resource
+def load_thumbnail_proxy():
+    proxy = ThumbnailProxy(DiskCache(THUMBNAIL_CACHE_DIR, THUMBNAIL_CACHE_MB << 20), upstream=THUMBNAIL_UPSTREAM)
+    try:
+        start_thumbnail_server(proxy, THUMBNAIL_PORT, THUMBNAIL_HOST)
+    except OSError:
+        # Port already taken, e.g. by another app worker proxying the same images
+        pass
+    return proxy
+
+def thumbnail_source(url):
+    # Remote posters go through the local proxy; anything else is used as is
+    proxy = load_thumbnail_proxy()
+    return thumbnail_url_for(THUMBNAIL_URL, url) if proxy.allowed(url) else url
+
+# Warms upcoming episodes into the chunk cache when the video server is asked to, one per process
+@st.cache_resource
+def load_prefetcher():
+    chunk_cache = load_chunk_cache()
+    return Prefetcher(chunk_cache) if chunk_cache is not None else None
+
+# Time-decayed trending scores, shared by every session
+@st.cache_resource
+def load_trending():
+    return load_catalog_watcher().attach(TrendingEngine)
+
 # Initialize session state
 if 'current_content' not in st.session_state:
     st.session_state.current_content = None
@@ -267,10 +487,10 @@ if 'viewing_history' not in st.session_state:
 
 def main():
     # Enhanced header with stats
-    content_data = load_content()
-    total_movies = len(content_data['movies'])
-    total_shows = len(content_data['tv_shows'])
-    total_episodes = sum(show.get('total_episodes', 0) for show in content_data['tv_shows'])
+    listing = load_listing()
+    total_movies = listing.count('movie')
+    total_shows = listing.count('tv_show')
+    total_episodes = listing.episode_count()
 
     st.markdown(f"""
     <div class="main-header">
@@ -292,21 +512,23 @@ def main():
 
     # User preferences
     st.sidebar.header("⚙️ Preferences")
-    quality_pref = st.sidebar.selectbox("Preferred Quality", ["HD", "4K", "8K"])
-    language_pref = st.sidebar.selectbox("Language", ["English", "Spanish", "French", "Mandarin"])
-    autoplay = st.sidebar.checkbox("Autoplay", value=True)
+    # Titles not available in the chosen quality and language are hidden
+    # Keyed so the player, drawn before the sidebar, can read it from session state
+    quality_pref = st.sidebar.selectbox("Preferred Quality", QUALITIES, key='quality_pref')
+    language_pref = st.sidebar.selectbox("Language", LANGUAGES)
+    autoplay = st.sidebar.checkbox("Autoplay", value=True, key='autoplay')
 
     # Advanced filters for content pages
     if page in ["🎬 Movies", "📺 TV Shows"]:
         st.sidebar.header("🔍 Advanced Filters")
-        content_list = content_data['movies'] if page == "🎬 Movies" else content_data['tv_shows']
+        content_type = 'movie' if page == "🎬 Movies" else 'tv_show'
 
-        # Genre filter
-        genres = sorted(set(content['genre'] for content in content_list))
-        selected_genre = st.sidebar.selectbox("Genre", ["All"] + genres)
+        # Genre filter; filled in below, once its counts for the chosen years and rating are known
+        genres = listing.distinct_genres(content_type)
+        genre_slot = st.sidebar.empty()
 
         # Year filter
-        years = sorted(set(content['year'] for content in content_list))
+        years = listing.distinct_years(content_type)
         year_range = st.sidebar.slider("Year Range", 
                                      min(years) if years else 2020, 
                                      max(years) if years else 2024, 
@@ -315,6 +537,13 @@ def main():
         # Rating filter
         rating_filter = st.sidebar.slider("Minimum Rating", 0.0, 10.0, 0.0, 0.1)
 
+        # Live result count for each genre option
+        genre_counts = listing.facet_counts(content_type, year_range, rating_filter, language_pref, quality_pref)
+        total_matches = sum(genre_counts.values())
+        selected_genre = genre_slot.selectbox(
+            "Genre", ["All"] + genres, key=f"{content_type}_genre",
+            format_func=lambda genre: f"{genre} ({genre_counts.get(genre, 0) if genre != 'All' else total_matches:,})")
+
         # Sort options
         sort_by = st.sidebar.selectbox("Sort By", ["Rating", "Year", "Views", "Title"])
         sort_order = st.sidebar.radio("Order", ["Descending", "Ascending"])
@@ -327,29 +556,31 @@ def main():
 
     # Route to appropriate page
     if page == "🏠 Home":
-        display_home(content_data)
+        display_home(listing)
     elif page == "🎬 Movies":
-        display_movies(content_data, selected_genre, year_range, rating_filter, sort_by, sort_order)
+        display_movies(listing, selected_genre, year_range, rating_filter, language_pref, quality_pref,
+                       sort_by, sort_order)
     elif page == "📺 TV Shows":
-        display_tv_shows(content_data, selected_genre, year_range, rating_filter, sort_by, sort_order)
+        display_tv_shows(listing, selected_genre, year_range, rating_filter, language_pref, quality_pref,
+                         sort_by, sort_order)
     elif page == "🔍 Search":
-        display_search(content_data)
+        display_search(load_catalog(), load_search_index(), language_pref, quality_pref)
     elif page == "🔥 Trending":
-        display_trending(content_data)
+        display_trending(listing, language_pref, quality_pref)
     elif page == "❤️ Watchlist":
-        display_watchlist(content_data)
+        display_watchlist(listing)
     elif page == "📊 Analytics":
-        display_analytics(content_data)
+        display_analytics(listing)
 
-def display_home(content_data):
+def display_home(listing):
     st.header("🏠 Welcome to StreamFlix Pro")
 
     # Hero section with featured content
     col1, col2 = st.columns([2, 1])
 
     with col1:
-        if content_data['movies']:
-            featured = max(content_data['movies'], key=lambda x: x['rating'])
+        if listing.count('movie'):
+            featured = listing.top_rated(1, 'movie')[0]
             st.markdown(f"""
             <div class="feature-highlight">
                 <h3>🌟 Featured: {featured['title']}</h3>
@@ -382,38 +613,29 @@ def display_home(content_data):
     # Categories showcase
     st.subheader("🎭 Browse by Category")
 
-    # Get content by genre
-    all_content = content_data['movies'] + content_data['tv_shows']
-    genres = {}
-    for content in all_content:
-        genre = content['genre']
-        if genre not in genres:
-            genres[genre] = []
-        genres[genre].append(content)
-
-    for genre, content_list in genres.items():
-        with st.expander(f"{genre} ({len(content_list)} items)"):
-            cols = st.columns(min(len(content_list), 4))
-            for idx, content in enumerate(content_list[:4]):
+    # Genre buckets, each with its first few titles
+    for genre, total, showcase in listing.genre_showcase(4):
+        with st.expander(f"{genre} ({total} items)"):
+            cols = st.columns(min(total, 4))
+            for idx, (content, content_type) in enumerate(showcase):
                 if idx < len(cols):
                     with cols[idx]:
-                        content_type = 'movie' if content in content_data['movies'] else 'tv_show'
                         display_content_thumbnail(content, content_type)
 
-def display_movies(content_data, genre_filter, year_range, rating_filter, sort_by, sort_order):
+def display_movies(listing, genre_filter, year_range, rating_filter, language_pref, quality_pref,
+                   sort_by, sort_order):
     st.header("🎬 Movies Collection")
 
-    # Apply filters
-    filtered_movies = filter_content(content_data['movies'], genre_filter, year_range, rating_filter)
+    # Apply filters and sorting, materializing only the current page
+    page, total_movies, filtered_movies = query_page('movies', listing, 'movie', genre_filter, year_range,
+                                                     rating_filter, language_pref, quality_pref,
+                                                     sort_by, sort_order)
 
-    # Apply sorting
-    filtered_movies = sort_content(filtered_movies, sort_by, sort_order)
-
-    if not filtered_movies:
+    if not total_movies:
         st.warning("No movies match your current filters.")
         return
 
-    st.info(f"Showing {len(filtered_movies)} movies")
+    st.info(f"Showing {total_movies} movies")
 
     # Display movies in responsive grid
     cols = st.columns(3)
@@ -421,20 +643,22 @@ def display_movies(content_data, genre_filter, year_range, rating_filter, sort_b
         with cols[idx % 3]:
             display_enhanced_content_card(movie, 'movie')
 
-def display_tv_shows(content_data, genre_filter, year_range, rating_filter, sort_by, sort_order):
-    st.header("📺 TV Shows Collection")
+    display_pager('movies', page, total_movies)
 
-    # Apply filters
-    filtered_shows = filter_content(content_data['tv_shows'], genre_filter, year_range, rating_filter)
+def display_tv_shows(listing, genre_filter, year_range, rating_filter, language_pref, quality_pref,
+                     sort_by, sort_order):
+    st.header("📺 TV Shows Collection")
 
-    # Apply sorting
-    filtered_shows = sort_content(filtered_shows, sort_by, sort_order)
+    # Apply filters and sorting, materializing only the current page
+    page, total_shows, filtered_shows = query_page('tv_shows', listing, 'tv_show', genre_filter, year_range,
+                                                   rating_filter, language_pref, quality_pref,
+                                                   sort_by, sort_order)
 
-    if not filtered_shows:
+    if not total_shows:
         st.warning("No TV shows match your current filters.")
         return
 
-    st.info(f"Showing {len(filtered_shows)} TV shows")
+    st.info(f"Showing {total_shows} TV shows")
 
     # Display TV shows in responsive grid
     cols = st.columns(3)
@@ -442,7 +666,9 @@ def display_tv_shows(content_data, genre_filter, year_range, rating_filter, sort
         with cols[idx % 3]:
             display_enhanced_content_card(show, 'tv_show')
 
-def display_search(content_data):
+    display_pager('tv_shows', page, total_shows)
+
+def display_search(catalog, search_index, language_pref, quality_pref):
     st.header("🔍 Advanced Search")
 
     col1, col2 = st.columns([2, 1])
@@ -455,7 +681,8 @@ def display_search(content_data):
         search_type = st.selectbox("Search in:", ["All", "Movies", "TV Shows"])
 
     if search_query:
-        search_results = perform_advanced_search(content_data, search_query, search_type)
+        search_results = perform_advanced_search(catalog, search_index, search_query, search_type,
+                                                 language_pref, quality_pref)
 
         if search_results:
             st.subheader(f"🎯 Search Results ({len(search_results)} found)")
@@ -466,7 +693,7 @@ def display_search(content_data):
                     col1, col2, col3 = st.columns([2, 3, 1])
 
                     with col1:
-                        st.image(content['thumbnail'], width=150)
+                        st.image(thumbnail_source(content['thumbnail']), width=150)
 
                     with col2:
                         st.write(f"**{content['title']}** ({content['year']})")
@@ -483,31 +710,24 @@ def display_search(content_data):
         else:
             st.warning("No results found. Try different keywords.")
 
-def display_trending(content_data):
+def display_trending(listing, language_pref, quality_pref):
     st.header("🔥 Trending Content")
 
-    # Combine and sort by views and rating
-    all_content = []
-    for movie in content_data['movies']:
-        movie_copy = movie.copy()
-        movie_copy['content_type'] = 'movie'
-        movie_copy['trend_score'] = movie['views'] * movie['rating'] / 1000
-        all_content.append(movie_copy)
-
-    for show in content_data['tv_shows']:
-        show_copy = show.copy()
-        show_copy['content_type'] = 'tv_show'
-        show_copy['trend_score'] = show['views'] * show['rating'] / 1000
-        all_content.append(show_copy)
-
-    trending_content = sorted(all_content, key=lambda x: x['trend_score'], reverse=True)
+    # Rank by time-decayed views and rating; chart and cards share one ranking
+    total_trending = listing.playable_count(language_pref, quality_pref)
+    page = min(listing_page('trending', (language_pref, quality_pref)), max(0, (total_trending - 1) // PAGE_SIZE))
+    # Only rank as far as the current page reaches
+    trending = trending_content(listing, max(10, (page + 1) * PAGE_SIZE), language_pref, quality_pref)
 
-    # Display trending chart
+    # Display trending chart (pandas is imported here, on the only page that needs it)
+    import pandas as pd
     st.subheader("📈 Trending Chart")
-    chart_data = pd.DataFrame([
-        {'Title': content['title'][:15], 'Views': content['views'], 'Rating': content['rating']}
-        for content in trending_content[:10]
-    ])
+    top_content = [content for content, _, _ in trending[:10]]
+    chart_data = pd.DataFrame({
+        'Title': [content['title'][:15] for content in top_content],
+        'Views': [content.get('views', 0) for content in top_content],
+        'Rating': [content['rating'] for content in top_content],
+    })
 
     col1, col2 = st.columns(2)
     with col1:
@@ -515,14 +735,17 @@ def display_trending(content_data):
     with col2:
         st.bar_chart(chart_data.set_index('Title')['Rating'])
 
-    # Display trending content cards
+    # Display trending content cards, one page at a time
     st.subheader("🎬 Trending Now")
     cols = st.columns(3)
-    for idx, content in enumerate(trending_content):
+    start = page * PAGE_SIZE
+    for idx, (content, content_type, trend_score) in enumerate(trending[start:start + PAGE_SIZE]):
         with cols[idx % 3]:
-            display_trending_card(content, content['content_type'])
+            display_trending_card(content, content_type, trend_score)
 
-def display_watchlist(content_data):
+    display_pager('trending', page, total_trending)
+
+def display_watchlist(listing):
     st.header("❤️ My Watchlist")
 
     if not st.session_state.watchlist:
@@ -531,20 +754,19 @@ def display_watchlist(content_data):
 
     st.success(f"You have {len(st.session_state.watchlist)} items in your watchlist")
 
-    # Find full content details
+    # Find full content details by id
     watchlist_content = []
     for item_id, content_type in st.session_state.watchlist:
-        content_list = content_data['movies'] if content_type == 'movie' else content_data['tv_shows']
-        content = next((c for c in content_list if c['id'] == item_id), None)
-        if content:
-            watchlist_content.append((content, content_type))
+        found = listing.lookup(item_id, content_type)
+        if found:
+            watchlist_content.append(found)
 
     # Display watchlist items
     for content, content_type in watchlist_content:
         col1, col2, col3 = st.columns([1, 3, 1])
 
         with col1:
-            st.image(content['thumbnail'], width=100)
+            st.image(thumbnail_source(content['thumbnail']), width=100)
 
         with col2:
             st.write(f"**{content['title']}** ({content['year']})")
@@ -561,121 +783,159 @@ def display_watchlist(content_data):
                 st.session_state.watchlist.remove((content['id'], content_type))
                 st.rerun()
 
-def display_analytics(content_data):
+def display_analytics(listing):
     st.header("📊 Platform Analytics")
 
     # Content statistics
     col1, col2, col3, col4 = st.columns(4)
 
     with col1:
-        total_movies = len(content_data['movies'])
+        total_movies = listing.count('movie')
         st.metric("Movies", total_movies, delta=None)
 
     with col2:
-        total_shows = len(content_data['tv_shows'])
+        total_shows = listing.count('tv_show')
         st.metric("TV Shows", total_shows, delta=None)
 
     with col3:
-        total_episodes = sum(show.get('total_episodes', 0) for show in content_data['tv_shows'])
+        total_episodes = listing.episode_count()
         st.metric("Episodes", total_episodes, delta=None)
 
     with col4:
-        avg_rating = sum(c['rating'] for c in content_data['movies'] + content_data['tv_shows']) /                     len(content_data['movies'] + content_data['tv_shows'])
+        avg_rating = listing.average_rating()
         st.metric("Avg Rating", f"{avg_rating:.1f}/10", delta=None)
 
+    # Charts are drawn once per catalog version and served as cached PNGs
+    charts = load_chart_cache()
+    chart_key = (id(listing), listing.version)
+
     # Genre distribution
     st.subheader("🎭 Genre Distribution")
-    genre_counts = {}
-    for content in content_data['movies'] + content_data['tv_shows']:
-        genre = content['genre']
-        genre_counts[genre] = genre_counts.get(genre, 0) + 1
-
-    genre_df = pd.DataFrame(list(genre_counts.items()), columns=['Genre', 'Count'])
-    st.bar_chart(genre_df.set_index('Genre'))
+    st.image(charts.get(('genres',) + chart_key, lambda ax: draw_genre_chart(ax, listing.genre_counts())))
 
-    # Rating distribution
+    # Rating distribution, drawn from the per-rating title counts
     st.subheader("⭐ Rating Distribution")
-    ratings = [content['rating'] for content in content_data['movies'] + content_data['tv_shows']]
-    rating_df = pd.DataFrame({'Rating': ratings})
-
-    fig, ax = plt.subplots()
-    ax.hist(rating_df['Rating'], bins=20, color='skyblue', edgecolor='black')
-    ax.set_xlabel('Rating')
-    ax.set_ylabel('Count')
-    ax.set_title('Rating Distribution')
-    st.pyplot(fig)
+    st.image(charts.get(('ratings',) + chart_key, lambda ax: draw_rating_chart(ax, listing.rating_counts())))
+
+    # Video delivery from the shared chunk cache
+    chunk_cache = load_chunk_cache()
+    if chunk_cache is not None:
+        st.subheader("🎞️ Video Delivery")
+        stats = chunk_cache.stats()
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Cache Hit Rate", f"{stats['hit_rate']:.1%}")
+        col2.metric("Served", f"{stats['bytes_served'] / 2**20:,.1f} MB")
+        col3.metric("Read from Disk", f"{stats['bytes_read'] / 2**20:,.1f} MB")
 
     # Top content
     st.subheader("🏆 Top Rated Content")
-    all_content = content_data['movies'] + content_data['tv_shows']
-    top_content = sorted(all_content, key=lambda x: x['rating'], reverse=True)[:10]
+    top_content = listing.top_rated(10)
 
     for idx, content in enumerate(top_content, 1):
         st.write(f"{idx}. **{content['title']}** - ⭐ {content['rating']}/10 ({content['genre']})")
 
+def draw_genre_chart(ax, genre_counts):
+    genres = sorted(genre_counts)
+    ax.bar(genres, [genre_counts[genre] for genre in genres], color='#667eea')
+    ax.set_xlabel('Genre')
+    ax.set_ylabel('Count')
+    ax.tick_params(axis='x', labelrotation=45)
+
+def draw_rating_chart(ax, rating_counts):
+    ax.hist(list(rating_counts), bins=20, weights=list(rating_counts.values()), color='skyblue', edgecolor='black')
+    ax.set_xlabel('Rating')
+    ax.set_ylabel('Count')
+    ax.set_title('Rating Distribution')
+
 # Helper functions
-def filter_content(content_list, genre_filter, year_range, rating_filter):
-    filtered = []
-    for content in content_list:
-        if (genre_filter == "All" or content['genre'] == genre_filter) and            (year_range[0] <= content['year'] <= year_range[1]) and            (content['rating'] >= rating_filter):
-            filtered.append(content)
-    return filtered
-
-def sort_content(content_list, sort_by, sort_order):
-    reverse = sort_order == "Descending"
-
-    if sort_by == "Rating":
-        return sorted(content_list, key=lambda x: x['rating'], reverse=reverse)
-    elif sort_by == "Year":
-        return sorted(content_list, key=lambda x: x['year'], reverse=reverse)
-    elif sort_by == "Views":
-        return sorted(content_list, key=lambda x: x.get('views', 0), reverse=reverse)
-    elif sort_by == "Title":
-        return sorted(content_list, key=lambda x: x['title'], reverse=not reverse)
-
-    return content_list
-
-def perform_advanced_search(content_data, query, search_type):
-    results = []
-    query_lower = query.lower()
-
-    content_lists = []
-    if search_type in ["All", "Movies"]:
-        content_lists.extend([(movie, 'movie') for movie in content_data['movies']])
-    if search_type in ["All", "TV Shows"]:
-        content_lists.extend([(show, 'tv_show') for show in content_data['tv_shows']])
-
-    for content, content_type in content_lists:
-        match_score = 0
-
-        # Title match (highest weight)
-        if query_lower in content['title'].lower():
-            match_score += 0.4
-
-        # Description match
-        if query_lower in content['description'].lower():
-            match_score += 0.2
-
-        # Genre match
-        if query_lower in content['genre'].lower():
-            match_score += 0.2
-
-        # Cast match (if available)
-        if 'cast' in content:
-            for actor in content['cast']:
-                if query_lower in actor.lower():
-                    match_score += 0.15
-                    break
+def filter_content(catalog, content_type, genre_filter, year_range, rating_filter, language_pref, quality_pref):
+    return catalog.filter(content_type, genre_filter, year_range, rating_filter, language_pref, quality_pref)
+
+def sort_content(catalog, rows, sort_by, sort_order, limit=None):
+    return catalog.sort(rows, sort_by, sort_order, limit)
+
+# Pagination for the card grids
+def listing_page(key, filters=None):
+    # Current page of a grid, back to the first page whenever its filters change
+    if st.session_state.get(f"{key}_filters") != filters:
+        st.session_state[f"{key}_filters"] = filters
+        st.session_state[f"{key}_page"] = 0
+    return st.session_state.get(f"{key}_page", 0)
+
+def query_page(key, listing, content_type, *filters):
+    page = listing_page(key, filters)
+    total, records = query_content(listing, content_type, *filters, limit=PAGE_SIZE, offset=page * PAGE_SIZE)
+    if total and not records:
+        # The listing shrank (e.g. after a catalog edit); fall back to its last page
+        page = (total - 1) // PAGE_SIZE
+        st.session_state[f"{key}_page"] = page
+        total, records = query_content(listing, content_type, *filters, limit=PAGE_SIZE, offset=page * PAGE_SIZE)
+    return page, total, records
+
+def display_pager(key, page, total):
+    pages = max(1, -(-total // PAGE_SIZE))
+    if pages == 1:
+        return
 
-        # Director match (if available)
-        if 'director' in content and query_lower in content['director'].lower():
-            match_score += 0.1
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        if st.button("◀ Previous", key=f"{key}_prev", disabled=page == 0):
+            st.session_state[f"{key}_page"] = page - 1
+            st.rerun()
+    with col2:
+        st.write(f"Page {page + 1} of {pages} ({total} titles)")
+    with col3:
+        if st.button("Next ▶", key=f"{key}_next", disabled=page >= pages - 1):
+            st.session_state[f"{key}_page"] = page + 1
+            st.rerun()
 
-        if match_score > 0:
-            results.append((content, content_type, match_score))
+# The k top-trending playable titles as [(record, content type, score)]
+def trending_content(listing, k, language_pref, quality_pref):
+    if isinstance(listing, CatalogStore):
+        # Scores and view events live in the shared store
+        return listing.trending(k, language_pref, quality_pref)
 
-    # Sort by match score
-    return sorted(results, key=lambda x: x[2], reverse=True)
+    trending = load_trending()
+    rows = trending.ranking(k, language_pref, quality_pref, listing)
+    return [(listing.record(row), listing.content_type(row), score)
+            for row, score in zip(rows, trending.scores(rows))]
+
+def record_view(content_id):
+    if CATALOG_BACKEND == 'sqlite':
+        load_catalog_store_resource().record_view(content_id)
+    else:
+        load_trending().record_view(content_id)
+
+# Filtered, sorted listing as (total matches, records in [offset, offset + limit))
+def query_content(listing, content_type, genre_filter, year_range, rating_filter, language_pref, quality_pref,
+                  sort_by, sort_order, limit=None, offset=0):
+    if isinstance(listing, CatalogStore):
+        # One indexed query in the shared store
+        return listing.query(content_type, genre_filter, year_range, rating_filter,
+                             sort_by, sort_order, limit, offset, language_pref, quality_pref)
+
+    rows = filter_content(listing, content_type, genre_filter, year_range, rating_filter,
+                          language_pref, quality_pref)
+    if limit is None:
+        return len(rows), [listing.record(row) for row in sort_content(listing, rows, sort_by, sort_order)]
+    window = sort_content(listing, rows, sort_by, sort_order, offset + limit)[offset:]
+    return len(rows), [listing.record(row) for row in window]
+
+def perform_advanced_search(catalog, search_index, query, search_type, language_pref, quality_pref):
+    # Per-title bitmask check for the player preferences
+    playable = catalog.playable(language_pref, quality_pref)
+    # Rows the watcher added after this catalog version was read are skipped
+    allowed = lambda row: row < len(playable) and playable[row]
+    if search_type == "Movies":
+        allowed = lambda row: row < len(playable) and playable[row] and catalog.content_type(row) == 'movie'
+    elif search_type == "TV Shows":
+        allowed = lambda row: row < len(playable) and playable[row] and catalog.content_type(row) == 'tv_show'
+
+    # Ranked by weighted BM25 over title, description, genre, cast and director,
+    # equal scores in file order as after a fresh load
+    positions = catalog.positions
+    matches = sorted(search_index.search(query, allowed), key=lambda match: (-match[1], positions[match[0]]))
+    return [(catalog.record(row), catalog.content_type(row), match_score) for row, match_score in matches]
 
 def display_enhanced_content_card(content, content_type):
     st.markdown(f"""
@@ -715,7 +975,7 @@ def display_enhanced_content_card(content, content_type):
             display_content_details(content, content_type)
 
 def display_content_thumbnail(content, content_type):
-    st.image(content['thumbnail'], use_column_width=True)
+    st.image(thumbnail_source(content['thumbnail']), use_column_width=True)
     st.write(f"**{content['title']}**")
     st.write(f"⭐ {content['rating']} | {content['year']}")
 
@@ -725,11 +985,11 @@ def display_content_thumbnail(content, content_type):
         add_to_viewing_history(content)
         st.rerun()
 
-def display_trending_card(content, content_type):
+def display_trending_card(content, content_type, trend_score):
     st.markdown(f"""
     <div class="content-card">
         <h4>🔥 {content['title']}</h4>
-        <p><strong>Trend Score:</strong> {content['trend_score']:.0f}</p>
+        <p><strong>Trend Score:</strong> {trend_score:.0f}</p>
         <p><strong>Views:</strong> {content['views']:,} | <strong>Rating:</strong> ⭐ {content['rating']}/10</p>
         <p>{content['description'][:100]}...</p>
     </div>
@@ -792,6 +1052,8 @@ def add_to_viewing_history(content):
     # Keep only last 10 items
     st.session_state.viewing_history = st.session_state.viewing_history[:10]
 
+    record_view(content['id'])
+
 # Video player integration
 def display_video_player(content, content_type):
     st.markdown(f"""
@@ -800,9 +1062,12 @@ def display_video_player(content, content_type):
     </div>
     """, unsafe_allow_html=True)
 
+    # Renditions the player may switch between
+    allowed = allowed_qualities(content.get('quality'), st.session_state.get('quality_pref', QUALITIES[0]))
+
     try:
         if content_type == 'movie':
-            st.video(content['video_url'], start_time=0)
+            play_video(content['video_url'], allowed)
             # st.video('https://youtu.be/qzGxK6Uiu04', start_time=0)
         else:  # TV show
             if 'episodes' in content:
@@ -826,8 +1091,11 @@ def display_video_player(content, content_type):
                     if 'air_date' in selected_episode:
                         st.write(f"**Air Date:** {selected_episode['air_date']}")
 
-                # Play episode
-                st.video(selected_episode['video_url'], start_time=0)
+                # Play episode, warming the next one for autoplay as this one nears its end
+                upcoming_url = None
+                if st.session_state.get('autoplay', True) and selected_episode_idx + 1 < len(episodes):
+                    upcoming_url = episodes[selected_episode_idx + 1].get('video_url')
+                play_video(selected_episode['video_url'], allowed, upcoming_url)
             else:
                 st.warning("No episodes available for this show.")
 
@@ -875,6 +1143,11 @@ def display_content_info_panel(content, content_type):
             for quality in content['quality']:
                 st.write(f"• {quality}")
 
+        # Filled in from the video file by mp4_probe.py
+        if 'resolution' in content:
+            st.write(f"**Source:** {content['resolution']}, {content.get('video_codec', 'unknown codec')}, "
+                     f"{content.get('bitrate', 0) / 1e6:.1f} Mb/s")
+
 # Check if content should be played
 if st.session_state.current_content:
     st.markdown("---")
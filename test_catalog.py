@@ -0,0 +1,92 @@
+# Catalog filters and sorts against the original list-based implementation
+import random
+
+import pytest
+
+from catalog import LANGUAGES, QUALITIES, Catalog
+
+GENRES = ['Drama', 'Sci-Fi', 'Comedy', 'Horror']
+
+
+def make_content(rng, content_id, tv):
+    content = {
+        'id': content_id,
+        'title': rng.choice(['Alpha', 'beta', 'Gamma', 'Zed', 'Éclair', 'alpha']),
+        'genre': rng.choice(GENRES),
+        'year': rng.randint(2015, 2024),
+        # Ratings on and between the tenth-of-a-star buckets
+        'rating': rng.choice([0.0, 4.95, 5.0, 7.5, 7.55, 8.0, 10.0]),
+        'views': rng.choice([0, 1000, 5000]),
+    }
+    if rng.random() < 0.8:
+        content['languages'] = rng.sample(LANGUAGES, rng.randint(0, 3))
+    if rng.random() < 0.8:
+        content['quality'] = rng.sample(QUALITIES, rng.randint(0, 2))
+    if tv:
+        content['total_episodes'] = rng.randint(1, 9)
+    return content
+
+
+def reference_filter(content_list, genre_filter, year_range, rating_filter, language, quality):
+    filtered = []
+    for content in content_list:
+        if (genre_filter == "All" or content['genre'] == genre_filter) and \
+                (year_range[0] <= content['year'] <= year_range[1]) and \
+                (content['rating'] >= rating_filter) and \
+                (language is None or language in content.get('languages', LANGUAGES)) and \
+                (quality is None or quality in content.get('quality', QUALITIES)):
+            filtered.append(content)
+    return filtered
+
+
+def reference_sort(content_list, sort_by, sort_order):
+    reverse = sort_order == "Descending"
+    if sort_by == "Rating":
+        return sorted(content_list, key=lambda x: x['rating'], reverse=reverse)
+    elif sort_by == "Year":
+        return sorted(content_list, key=lambda x: x['year'], reverse=reverse)
+    elif sort_by == "Views":
+        return sorted(content_list, key=lambda x: x.get('views', 0), reverse=reverse)
+    elif sort_by == "Title":
+        return sorted(content_list, key=lambda x: x['title'], reverse=not reverse)
+    return content_list
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_filter_and_sort_match_reference(seed):
+    rng = random.Random(seed)
+    content_data = {
+        'movies': [make_content(rng, i, False) for i in range(300)],
+        'tv_shows': [make_content(rng, 1000 + i, True) for i in range(200)],
+    }
+    catalog = Catalog(content_data)
+    for _ in range(200):
+        content_type = rng.choice(['movie', 'tv_show'])
+        genre_filter = rng.choice(['All', 'Unknown'] + GENRES)
+        low = rng.randint(2014, 2024)
+        year_range = (low, rng.randint(low, 2025))
+        rating_filter = rng.choice([0.0, 0.05, 4.95, 5.0, 7.51, 7.55, 10.0])
+        language = rng.choice([None, 'Klingon'] + LANGUAGES)
+        quality = rng.choice([None] + QUALITIES)
+        sort_by = rng.choice(['Rating', 'Year', 'Views', 'Title', 'None'])
+        sort_order = rng.choice(['Descending', 'Ascending'])
+        limit = rng.choice([None, 1, 12])
+
+        section = content_data['movies' if content_type == 'movie' else 'tv_shows']
+        expected = reference_sort(reference_filter(section, genre_filter, year_range, rating_filter, language, quality),
+                                  sort_by, sort_order)
+        rows = catalog.filter(content_type, genre_filter, year_range, rating_filter, language, quality)
+        ordered = catalog.sort(rows, sort_by, sort_order, limit)
+        assert [catalog.record(row)['id'] for row in ordered] == [content['id'] for content in expected][:limit]
+
+
+def test_facet_counts_match_reference():
+    rng = random.Random(7)
+    content_data = {'movies': [make_content(rng, i, False) for i in range(400)], 'tv_shows': []}
+    catalog = Catalog(content_data)
+    for rating_filter in [0.0, 4.95, 7.52, 10.0]:
+        matching = reference_filter(content_data['movies'], 'All', (2016, 2022), rating_filter, None, '4K')
+        expected = {}
+        for content in matching:
+            expected[content['genre']] = expected.get(content['genre'], 0) + 1
+        assert catalog.facet_counts('movie', (2016, 2022), rating_filter, None, '4K') == expected
@@ -0,0 +1,91 @@
+# Hot reloads publish a new catalog that pages exactly like a fresh load
+import copy
+import json
+import os
+import random
+
+from catalog import Catalog
+from catalog_watcher import CatalogWatcher, file_signature
+from search_index import SearchIndex
+from trending import TrendingEngine
+
+GENRES = ['Drama', 'Sci-Fi', 'Comedy']
+
+
+def make_content(rng, content_id, tv):
+    content = {'id': content_id, 'title': rng.choice(['Alpha', 'beta', 'Gamma']), 'genre': rng.choice(GENRES),
+               'year': rng.randint(2018, 2021), 'rating': rng.choice([5.0, 7.5, 8.0]),
+               'views': rng.choice([0, 1000]), 'description': 'd'}
+    if tv:
+        content['total_episodes'] = rng.randint(1, 9)
+    return content
+
+
+def write(path, content_data):
+    with open(path, 'w') as f:
+        json.dump(content_data, f)
+    # Make sure the signature changes even within the filesystem's timestamp resolution
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+
+def ids(catalog, rows):
+    return [int(catalog.ids[row]) for row in rows]
+
+
+def test_reload_matches_fresh_load(tmp_path):
+    rng = random.Random(3)
+    content_data = {'movies': [make_content(rng, i, False) for i in range(120)],
+                    'tv_shows': [make_content(rng, 1000 + i, True) for i in range(80)]}
+    path = str(tmp_path / 'content_database.json')
+    write(path, content_data)
+    catalog = Catalog(content_data)
+    watcher = CatalogWatcher(path, catalog, file_signature(path))
+    trending = watcher.attach(TrendingEngine)
+    # Cached permutations must be rebuilt, not reused, after the edits
+    catalog.sort(catalog.rows('movie'), 'Rating', 'Descending')
+
+    for step in range(3):
+        content_data = copy.deepcopy(content_data)
+        for k in range(10):
+            movies = content_data['movies']
+            movies.insert(rng.randrange(len(movies)), make_content(rng, 5000 + 100 * step + k, False))
+        del content_data['movies'][rng.randrange(len(content_data['movies']))]
+        content_data['tv_shows'][0]['rating'] = 8.0
+        content_data['tv_shows'].reverse()
+        write(path, content_data)
+        assert watcher.poll() is not None
+
+    reloaded = watcher.catalog
+    fresh = Catalog(content_data)
+    for content_type in ['movie', 'tv_show']:
+        for sort_by in ['Rating', 'Year', 'Views', 'Title', 'None']:
+            for sort_order in ['Descending', 'Ascending']:
+                a = reloaded.sort(reloaded.filter(content_type, 'All', (2018, 2021), 0.0), sort_by, sort_order)
+                b = fresh.sort(fresh.filter(content_type, 'All', (2018, 2021), 0.0), sort_by, sort_order)
+                assert ids(reloaded, a) == ids(fresh, b)
+    assert [r['id'] for r in reloaded.top_rated(30)] == [r['id'] for r in fresh.top_rated(30)]
+    assert ids(reloaded, trending.ranking(40)) == ids(fresh, TrendingEngine(fresh).ranking(40))
+
+
+def test_readers_keep_their_catalog_version(tmp_path):
+    rng = random.Random(5)
+    content_data = {'movies': [make_content(rng, i, False) for i in range(50)], 'tv_shows': []}
+    path = str(tmp_path / 'content_database.json')
+    write(path, content_data)
+    catalog = Catalog(content_data)
+    watcher = CatalogWatcher(path, catalog, file_signature(path))
+    watcher.attach(SearchIndex)
+    before = (len(catalog), catalog.version, ids(catalog, catalog.sort(catalog.rows(), 'Rating', 'Descending')))
+
+    edited = copy.deepcopy(content_data)
+    edited['movies'].append(make_content(rng, 999, False))
+    del edited['movies'][0]
+    edited['movies'][1]['rating'] = 1.0
+    write(path, edited)
+    watcher.poll()
+
+    # A session still holding the old version sees it exactly as it was
+    assert watcher.catalog is not catalog
+    assert (len(catalog), catalog.version, ids(catalog, catalog.sort(catalog.rows(), 'Rating', 'Descending'))) == before
+    assert watcher.catalog.lookup(999) is not None and catalog.lookup(999) is None
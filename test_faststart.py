@@ -0,0 +1,87 @@
+# Chunk offsets survive moving the moov box in front of the media data
+import struct
+
+import pytest
+
+from faststart import chunk_offsets, faststart, is_faststart, layout, offset_tables
+from mp4_boxes import BoxTree, read_payload
+
+
+def box(box_type, payload):
+    return struct.pack('>I4s', 8 + len(payload), box_type) + payload
+
+
+def offset_box(box_type, offsets):
+    code = '>%dI' if box_type == b'stco' else '>%dQ'
+    return box(box_type, bytes(4) + struct.pack('>I', len(offsets)) + struct.pack(code % len(offsets), *offsets))
+
+
+def moov(*tables):
+    # One trak per chunk offset table
+    traks = [box(b'trak', box(b'mdia', box(b'minf', box(b'stbl', table)))) for table in tables]
+    return box(b'moov', b''.join(traks))
+
+
+def write_movie(path, table_types):
+    # ftyp, a free box, mdat and a trailing free box, with moov at the end
+    ftyp = box(b'ftyp', b'isom' + bytes(4) + b'isommp41')
+    free = box(b'free', bytes(13))
+    media = bytes(range(256)) * 4
+    mdat_offset = len(ftyp) + len(free)
+    # Chunks spread over mdat, one table per track
+    offsets = [[mdat_offset + 8 + 100 * (i + track) for i in range(5)] for track in range(len(table_types))]
+    tables = [offset_box(box_type, track) for box_type, track in zip(table_types, offsets)]
+    with open(path, 'wb') as f:
+        f.write(ftyp + free + box(b'mdat', media) + box(b'free', b'tail') + moov(*tables))
+    return offsets
+
+
+def read_tables(path):
+    _, moov_box, _ = layout(path)
+    with open(path, 'rb') as f:
+        tree = BoxTree.parse(read_payload(f, moov_box), b'moov')
+    return [(node.type, chunk_offsets(node)) for node in tree.walk() if node.type in (b'stco', b'co64')]
+
+
+@pytest.mark.parametrize('table_types', [[b'stco'], [b'co64'], [b'stco', b'co64']])
+def test_faststart_keeps_chunks_in_place(tmp_path, table_types):
+    source = tmp_path / 'movie.mp4'
+    output = tmp_path / 'faststart.mp4'
+    offsets = write_movie(source, table_types)
+    assert not is_faststart(source)
+
+    assert faststart(str(source), str(output))
+    assert is_faststart(output)
+    boxes, _, _ = layout(output)
+    assert [b.type for b in boxes] == [b'ftyp', b'free', b'moov', b'mdat', b'free']
+
+    original = source.read_bytes()
+    moved = output.read_bytes()
+    # co64 tables narrow to stco, four bytes per offset
+    narrowed = sum(len(track) for box_type, track in zip(table_types, offsets) if box_type == b'co64')
+    assert len(moved) == len(original) - 4 * narrowed
+    tables = read_tables(output)
+    assert len(tables) == len(offsets)
+    for (box_type, new_offsets), old_offsets in zip(tables, offsets):
+        # Small offsets always fit the compact table
+        assert box_type == b'stco'
+        for old, new in zip(old_offsets, new_offsets):
+            assert moved[new:new + 16] == original[old:old + 16]
+
+
+def test_faststart_skips_files_already_fast_start(tmp_path):
+    source = tmp_path / 'movie.mp4'
+    write_movie(source, [b'stco'])
+    output = tmp_path / 'faststart.mp4'
+    faststart(str(source), str(output))
+    assert not faststart(str(output))
+
+
+def test_offset_tables_widen_past_32_bits():
+    payload = bytes(4)
+    assert offset_tables(payload, [1, 0xFFFFFFFF])[0] == b'stco'
+    box_type, wide = offset_tables(payload, [1, 0x100000000])
+    assert box_type == b'co64'
+    node = BoxTree(box_type, payload=wide)
+    assert chunk_offsets(node) == [1, 0x100000000]
+
@@ -0,0 +1,36 @@
+# Range header parsing for the local video server
+import pytest
+
+from video_server import parse_range
+
+
+@pytest.mark.parametrize('header, expected', [
+    (None, None),
+    ('', None),
+    ('bytes=0-99', (0, 99)),
+    ('bytes=100-', (100, 999)),
+    ('bytes=900-5000', (900, 999)),
+    ('bytes=999-999', (999, 999)),
+    ('bytes=-50', (950, 999)),
+    ('bytes=-5000', (0, 999)),
+    # Headers we may ignore and answer with the whole file
+    ('bytes=99-0', None),
+    ('bytes=-', None),
+    ('bytes=0-1,5-6', None),
+    ('items=0-99', None),
+    ('bytes=abc', None),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize('header, size', [
+    ('bytes=1000-', 1000),
+    ('bytes=1000-2000', 1000),
+    ('bytes=-0', 1000),
+    ('bytes=0-', 0),
+    ('bytes=-5', 0),
+])
+def test_parse_range_unsatisfiable(header, size):
+    with pytest.raises(ValueError):
+        parse_range(header, size)
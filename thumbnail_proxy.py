@@ -0,0 +1,297 @@
+# Local proxy for remote poster images. Each image is fetched once over pooled
+# keep-alive connections, kept in a size-capped on-disk LRU and served with
+# long-lived cache headers, so pages never wait on the image host twice.
+import hashlib
+import http.client
+import json
+import mimetypes
+import os
+import sys
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlparse
+
+THUMBNAIL_PATH = '/thumb'
+METRICS_PATH = '/metrics'
+# Hosts the proxy fetches from; anything else is refused so it is not an open proxy
+THUMBNAIL_HOSTS = ['via.placeholder.com']
+# Poster URLs never change content, so browsers may keep them for a year
+CACHE_CONTROL = 'public, max-age=31536000, immutable'
+MAX_IMAGE_BYTES = 5 << 20
+CONNECTIONS_PER_HOST = 4
+UPSTREAM_TIMEOUT = 10
+
+
+class UpstreamError(Exception):
+    pass
+
+
+class ConnectionPool:
+    # Idle keep-alive connections per (scheme, host, port), reused across requests
+    def __init__(self, per_host=CONNECTIONS_PER_HOST, timeout=UPSTREAM_TIMEOUT):
+        self.per_host = per_host
+        self.timeout = timeout
+        self.idle = {}
+        self.lock = threading.Lock()
+        self.opened = 0
+
+    def connect(self, origin):
+        scheme, host, port = origin
+        with self.lock:
+            idle = self.idle.get(origin)
+            if idle:
+                return idle.pop(), True
+            self.opened += 1
+        connection_class = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        return connection_class(host, port, timeout=self.timeout), False
+
+    def release(self, origin, connection):
+        with self.lock:
+            idle = self.idle.setdefault(origin, [])
+            if len(idle) < self.per_host:
+                idle.append(connection)
+                return
+        connection.close()
+
+    def get(self, url):
+        # (status, content type, body) of a GET; retried once if a reused connection went stale
+        parsed = urlparse(url)
+        origin = (parsed.scheme, parsed.hostname, parsed.port or (443 if parsed.scheme == 'https' else 80))
+        target = (parsed.path or '/') + (f'?{parsed.query}' if parsed.query else '')
+        for attempt in range(2):
+            connection, reused = self.connect(origin)
+            try:
+                connection.request('GET', target, headers={'User-Agent': 'StreamFlixPro-thumbnails'})
+                response = connection.getresponse()
+                body = response.read(MAX_IMAGE_BYTES + 1)
+            except (http.client.RemoteDisconnected, ConnectionError, http.client.BadStatusLine) as e:
+                connection.close()
+                if reused and attempt == 0:
+                    continue
+                raise UpstreamError(str(e)) from e
+            except OSError:
+                connection.close()
+                raise
+            if response.will_close or len(body) > MAX_IMAGE_BYTES:
+                connection.close()
+            else:
+                self.release(origin, connection)
+            return response.status, response.getheader('Content-Type', ''), body
+
+
+class DiskCache:
+    # Files named by key, least recently used first; recency survives restarts via mtime
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        files = [entry for entry in os.scandir(directory) if entry.is_file() and not entry.name.endswith('.tmp')]
+        for entry in sorted(files, key=lambda entry: entry.stat().st_mtime):
+            self.entries[os.path.splitext(entry.name)[0]] = (entry.name, entry.stat().st_size)
+            self.size += entry.stat().st_size
+        self.evict()
+
+    def get(self, key):
+        # (body, content type) or None
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            self.entries.move_to_end(key)
+        name = entry[0]
+        path = os.path.join(self.directory, name)
+        try:
+            with open(path, 'rb') as f:
+                body = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            with self.lock:
+                if self.entries.pop(key, None) is not None:
+                    self.size -= entry[1]
+            return None
+        return body, mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+    def put(self, key, body, content_type):
+        name = key + (mimetypes.guess_extension(content_type.split(';')[0].strip()) or '')
+        path = os.path.join(self.directory, name)
+        temporary = f'{path}.{threading.get_ident()}.tmp'
+        with open(temporary, 'wb') as f:
+            f.write(body)
+        os.replace(temporary, path)
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= old[1]
+            self.entries[key] = (name, len(body))
+            self.size += len(body)
+        self.evict()
+
+    def evict(self):
+        while True:
+            with self.lock:
+                if self.size <= self.max_bytes or not self.entries:
+                    return
+                _, (name, size) = self.entries.popitem(last=False)
+                self.size -= size
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+
+class ThumbnailProxy:
+    def __init__(self, cache, pool=None, hosts=THUMBNAIL_HOSTS, upstream=None):
+        self.cache = cache
+        self.pool = pool or ConnectionPool()
+        self.hosts = set(hosts)
+        # Fetch every image from this base URL instead of its own host (e.g. a local stand-in)
+        self.upstream = upstream
+        self.fetching = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def allowed(self, url):
+        parsed = urlparse(url or '')
+        return parsed.scheme in ('http', 'https') and parsed.hostname in self.hosts
+
+    def get(self, url):
+        # (body, content type, etag); raises ValueError for URLs outside THUMBNAIL_HOSTS
+        if not self.allowed(url):
+            raise ValueError(f"Not a thumbnail URL: {url}")
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        cached = self.cache.get(key)
+        if cached is not None:
+            with self.lock:
+                self.hits += 1
+            return cached + (key,)
+
+        # One upstream fetch per image, however many cards ask for it at once
+        with self.lock:
+            lock = self.fetching.setdefault(key, threading.Lock())
+        try:
+            with lock:
+                cached = self.cache.get(key)
+                fetched = cached is None
+                if fetched:
+                    cached = self.fetch(url, key)
+        finally:
+            with self.lock:
+                self.fetching.pop(key, None)
+        with self.lock:
+            if fetched:
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        return cached + (key,)
+
+    def fetch(self, url, key):
+        if self.upstream:
+            parsed = urlparse(url)
+            url = self.upstream.rstrip('/') + parsed.path + (f'?{parsed.query}' if parsed.query else '')
+        status, content_type, body = self.pool.get(url)
+        if status != 200 or not content_type.startswith('image/') or len(body) > MAX_IMAGE_BYTES:
+            raise UpstreamError(f"{url}: HTTP {status} {content_type}")
+        self.cache.put(key, body, content_type)
+        return body, content_type.split(';')[0].strip()
+
+    def stats(self):
+        with self.lock:
+            requests = self.hits + self.misses + self.coalesced
+            return {
+                'requests': requests,
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                # Share of requests that did not need their own upstream fetch
+                'hit_rate': (self.hits + self.coalesced) / requests if requests else 0.0,
+                'upstream_connections': self.pool.opened,
+                'cached_bytes': self.cache.size,
+                'cached_images': len(self.cache.entries),
+            }
+
+
+def thumbnail_url_for(base_url, url):
+    return f"{base_url.rstrip('/')}{THUMBNAIL_PATH}?url={quote(url, safe='')}"
+
+
+class ThumbnailRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        if parsed.path == METRICS_PATH:
+            self.send_body(200, 'application/json', json.dumps(self.server.proxy.stats()).encode('utf-8'),
+                           {'Cache-Control': 'no-store'})
+            return
+        if parsed.path != THUMBNAIL_PATH:
+            self.send_error(404)
+            return
+        url = parse_qs(parsed.query).get('url', [''])[0]
+        try:
+            body, content_type, etag = self.server.proxy.get(url)
+        except ValueError:
+            self.send_error(403)
+            return
+        except (UpstreamError, OSError):
+            self.send_error(502)
+            return
+
+        headers = {'Cache-Control': CACHE_CONTROL, 'ETag': f'"{etag}"', 'Access-Control-Allow-Origin': '*'}
+        if self.headers.get('If-None-Match') == f'"{etag}"':
+            self.send_body(304, None, b'', headers)
+            return
+        self.send_body(200, content_type, body, headers)
+
+    def send_body(self, status, content_type, body, headers):
+        self.send_response(status)
+        if content_type:
+            self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+
+class ThumbnailServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, proxy):
+        self.proxy = proxy
+        super().__init__(address, ThumbnailRequestHandler)
+
+
+def start_thumbnail_server(proxy, port, host='localhost'):
+    # Serve in a daemon thread; raises OSError if the port is taken
+    server = ThumbnailServer((host, port), proxy)
+    threading.Thread(target=server.serve_forever, name='thumbnail-server', daemon=True).start()
+    return server
+
+
+def main():
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8503
+    directory = sys.argv[2] if len(sys.argv) > 2 else '.thumbnail_cache'
+    cache_mb = int(sys.argv[3]) if len(sys.argv) > 3 else 64
+    upstream = sys.argv[4] if len(sys.argv) > 4 else None
+    server = ThumbnailServer(('localhost', port), ThumbnailProxy(DiskCache(directory, cache_mb << 20), upstream=upstream))
+    print(f"Proxying thumbnails at http://localhost:{port}{THUMBNAIL_PATH}?url=... (cache in {directory})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
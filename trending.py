@@ -0,0 +1,104 @@
+# Time-decayed trending scores, updated incrementally as titles are watched
+import math
+import threading
+import time
+
+import numpy as np
+
+# Scores halve every week without new views
+HALF_LIFE = 7 * 24 * 3600
+DECAY_RATE = math.log(2) / HALF_LIFE
+
+# Re-anchor stored scores before the growth factor gets large enough to overflow
+MAX_EXPONENT = 50.0
+
+
+def popularity(content):
+    # The original trend score; each view is worth rating / 1000
+    return content.get('views', 0) * content['rating'] / 1000
+
+
+class TrendingEngine:
+    # Scores are stored relative to a reference time, scaled by exp(rate * (t - reference)).
+    # Decay then multiplies every title by the same factor, so the ranking only
+    # changes when a view event or catalog edit arrives.
+    def __init__(self, catalog, clock=time.time):
+        self.catalog = catalog
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.reference = clock()
+        # Catalog popularity counts as of load time and decays like any other view
+        self.loaded_at = self.reference
+        self.version = 0
+        self._ranking = None
+        self._ranking_key = None
+        self._candidates = 0
+
+        self.baseline = catalog.views * catalog.ratings / 1000
+        self.events = np.zeros(len(self.baseline))
+
+    def _growth(self, timestamp):
+        return math.exp(DECAY_RATE * (timestamp - self.reference))
+
+    def _rebase(self, now):
+        if DECAY_RATE * (now - self.reference) > MAX_EXPONENT:
+            factor = 1 / self._growth(now)
+            self.baseline *= factor
+            self.events *= factor
+            self.reference = now
+
+    def _grow(self, size):
+        if size > len(self.baseline):
+            extra = size - len(self.baseline)
+            self.baseline = np.append(self.baseline, np.zeros(extra))
+            self.events = np.append(self.events, np.zeros(extra))
+
+    def add(self, row, content):
+        # Catalog edits re-score against the load time, so they never look like fresh views
+        with self.lock:
+            self._grow(row + 1)
+            self.baseline[row] = popularity(content) * self._growth(self.loaded_at)
+            self.version += 1
+
+    def remove(self, row, content):
+        # Removed rows drop out through the catalog's live mask; views carry over an update
+        with self.lock:
+            self.version += 1
+
+    def use(self, catalog):
+        # A newer catalog version published by the watcher
+        with self.lock:
+            self.catalog = catalog
+
+    def record_view(self, content_id, count=1):
+        row = self.catalog.row_by_id.get(content_id)
+        if row is None:
+            return
+        with self.lock:
+            now = self.clock()
+            self._rebase(now)
+            self._grow(row + 1)
+            self.events[row] += count * self.catalog.ratings[row] / 1000 * self._growth(now)
+            self.version += 1
+
+    def ranking(self, k, language=None, quality=None, catalog=None):
+        # Rows of the k top-trending titles playable in the language and quality,
+        # reused until a view or edit arrives. Pass the catalog the caller reads
+        # the rows from, in case the watcher has published a newer one since.
+        with self.lock:
+            if catalog is None:
+                catalog = self.catalog
+            key = (self.version, catalog.version, language, quality)
+            if self._ranking_key != key or len(self._ranking) < k and len(self._ranking) < self._candidates:
+                # A row the watcher has just appended may not have been scored yet
+                self._grow(len(catalog.ids))
+                rows = np.flatnonzero(catalog.playable(language, quality))
+                self._ranking = catalog.top(self.baseline + self.events, k, rows)
+                self._ranking_key = key
+                self._candidates = len(rows)
+            return self._ranking[:k]
+
+    def scores(self, rows):
+        # Current decayed scores for the given rows
+        with self.lock:
+            return (self.baseline[rows] + self.events[rows]) / self._growth(self.clock())
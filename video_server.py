@@ -0,0 +1,218 @@
+# Byte-range HTTP server for local video files. Bodies go out with sendfile, or
+# through a shared chunk cache, so memory per viewer stays constant however
+# large the file is.
+import json
+import os
+import re
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, unquote, urlparse
+
+from chunk_cache import ChunkCache, file_key
+
+# Only media files are ever served from the root directory
+VIDEO_TYPES = {
+    '.mp4': 'video/mp4',
+    '.m4v': 'video/mp4',
+    '.mov': 'video/quicktime',
+    '.webm': 'video/webm',
+}
+
+# Playlists and segments written by hls_segmenter.py (init segments are plain .mp4)
+HLS_TYPES = {
+    '.m3u8': 'application/vnd.apple.mpegurl',
+    '.m4s': 'video/iso.segment',
+}
+
+RANGE_PATTERN = re.compile(r'bytes=(\d*)-(\d*)$')
+
+# Chunk cache counters as JSON
+METRICS_PATH = '/metrics'
+# ?path=<video>[&allowed=HD,4K]: warm a video's start into the chunk cache
+PREFETCH_PATH = '/prefetch'
+
+
+def parse_range(header, size):
+    # (start, end) inclusive for a single "bytes=" range, or None to send the whole
+    # file (no header, or one we may ignore). Raises ValueError if unsatisfiable.
+    match = RANGE_PATTERN.match(header.strip()) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        if last and int(last) < start:
+            return None
+        if start >= size:
+            raise ValueError("Range starts past the end of the file")
+        return start, min(int(last), size - 1) if last else size - 1
+    if last:
+        suffix = int(last)
+        if suffix == 0 or size == 0:
+            raise ValueError("Empty suffix range")
+        return max(size - suffix, 0), size - 1
+    return None
+
+
+def local_video_path(video_url, root='.'):
+    # Path relative to root for a servable local file, or None for remote URLs
+    parsed = urlparse(video_url)
+    if parsed.scheme or parsed.netloc:
+        return None
+    path = os.path.normpath(unquote(parsed.path))
+    if os.path.splitext(path)[1].lower() not in VIDEO_TYPES or not os.path.isfile(os.path.join(root, path)):
+        return None
+    return path
+
+
+def video_url_for(base_url, path):
+    return base_url.rstrip('/') + '/' + quote(path.replace(os.sep, '/'))
+
+
+class VideoRequestHandler(BaseHTTPRequestHandler):
+    # Keep-alive: players issue many small range requests while seeking
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        if parsed.path == METRICS_PATH:
+            self.send_metrics()
+            return
+        if parsed.path == PREFETCH_PATH:
+            self.prefetch(parse_qs(parsed.query))
+            return
+        self.serve(send_body=True)
+
+    def prefetch(self, query):
+        # Sent by the player near the end of the current video; warming runs in the background
+        prefetcher = self.server.prefetcher
+        root = self.server.root
+        path = local_video_path(query.get('path', [''])[0], root)
+        if prefetcher is None or path is None or not os.path.realpath(os.path.join(root, path)).startswith(root + os.sep):
+            self.send_error(404)
+            return
+        allowed = query['allowed'][0].split(',') if 'allowed' in query else None
+        prefetcher.schedule(path, allowed)
+        self.send_response(204)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+
+    def send_metrics(self):
+        cache = self.server.chunk_cache
+        body = json.dumps(cache.stats() if cache is not None else {}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_HEAD(self):
+        self.serve(send_body=False)
+
+    def resolve(self):
+        # (path, content type) of a servable file, or None
+        root = self.server.root
+        path = os.path.realpath(os.path.join(root, unquote(urlparse(self.path).path).lstrip('/')))
+        if not path.startswith(root + os.sep) or not os.path.isfile(path):
+            return None
+        if path in self.server.scripts:
+            return path, 'text/javascript'
+        content_type = self.server.media_types.get(os.path.splitext(path)[1].lower())
+        return (path, content_type) if content_type else None
+
+    def serve(self, send_body):
+        resolved = self.resolve()
+        if resolved is None:
+            self.send_error(404)
+            return
+        path, content_type = resolved
+
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            size = stat.st_size
+            try:
+                byte_range = parse_range(self.headers.get('Range'), size)
+            except ValueError:
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{size}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+
+            start, end = byte_range if byte_range else (0, size - 1)
+            length = end - start + 1 if size else 0
+            self.send_response(206 if byte_range else 200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(length))
+            self.send_header('Accept-Ranges', 'bytes')
+            if byte_range:
+                self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+            self.send_header('Last-Modified', self.date_time_string(stat.st_mtime))
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+
+            if send_body and length:
+                try:
+                    self.send_body(f, path, stat, start, end)
+                except (BrokenPipeError, ConnectionResetError):
+                    # Players drop connections all the time when seeking
+                    self.close_connection = True
+
+    def send_body(self, f, path, stat, start, end):
+        cache = self.server.chunk_cache
+        if cache is None:
+            # os.sendfile under the hood: the kernel copies file pages to the socket
+            self.connection.sendfile(f, start, end - start + 1)
+            return
+        # Popular titles are read from disk once and served to every viewer from memory
+        for piece in cache.iter_range(f, file_key(path, stat), start, end):
+            self.wfile.write(piece)
+
+
+class VideoServer(ThreadingHTTPServer):
+    daemon_threads = True
+    handler = VideoRequestHandler
+
+    def __init__(self, root, address, media_types=None, chunk_cache=None, scripts=(), prefetcher=None):
+        self.root = os.path.realpath(root)
+        self.media_types = dict({**VIDEO_TYPES, **HLS_TYPES} if media_types is None else media_types)
+        self.chunk_cache = chunk_cache
+        # Warms videos into chunk_cache on PREFETCH_PATH requests; must share its root
+        self.prefetcher = prefetcher
+        # Exact paths (relative to root) of scripts to serve, e.g. the vendored hls.js
+        self.scripts = {os.path.realpath(os.path.join(self.root, script)) for script in scripts}
+        super().__init__(address, self.handler)
+
+
+def start_video_server(root, port, host='localhost', chunk_cache=None, scripts=(), prefetcher=None):
+    # Serve in a daemon thread; raises OSError if the port is taken
+    server = VideoServer(root, (host, port), chunk_cache=chunk_cache, scripts=scripts, prefetcher=prefetcher)
+    threading.Thread(target=server.serve_forever, name='video-server', daemon=True).start()
+    return server
+
+
+def main():
+    root = sys.argv[1] if len(sys.argv) > 1 else '.'
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 8502
+    host = sys.argv[3] if len(sys.argv) > 3 else 'localhost'
+    cache_mb = int(sys.argv[4]) if len(sys.argv) > 4 else 256
+    # Imported here: both depend on this module
+    from hls_segmenter import HLS_JS
+    from prefetch import Prefetcher
+    chunk_cache = ChunkCache(cache_mb << 20) if cache_mb else None
+    server = VideoServer(root, (host, port), chunk_cache=chunk_cache, scripts=[HLS_JS],
+                         prefetcher=Prefetcher(chunk_cache, root) if chunk_cache else None)
+    print(f"Serving videos from {server.root} at http://{host}:{port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()